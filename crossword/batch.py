@@ -0,0 +1,164 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from crossword import Crossword
+from generate import CrosswordCreator
+
+# Vocabulary shared by the jobs in each worker process, see init_worker
+VOCABULARY = None
+
+
+def main():
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Generate crosswords for many structures with one word list."
+    )
+    parser.add_argument("words", help="text file of words, one per line")
+    parser.add_argument("structures", nargs="+",
+                        help="structure files, or directories of .txt structure files")
+    parser.add_argument("--solutions", type=int, default=1,
+                        help="puzzles to generate per structure, sharing no words")
+    parser.add_argument("--format", choices=["text", "json"], default="text",
+                        help="print grids as text, or one JSON object per line")
+    parser.add_argument("--images", default=None, metavar="DIR",
+                        help="directory to also save an image of each puzzle in")
+    parser.add_argument("--inference", choices=["none", "forward", "mac"],
+                        default="mac",
+                        help="pruning to do after each assignment during search")
+    parser.add_argument("--arc-consistency", choices=["ac3", "ac2001"],
+                        default="ac3", help="arc consistency algorithm")
+    parser.add_argument("--cache", default=None, metavar="DIR",
+                        help="directory to cache parsed structures and word lists in")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for tie-breaking")
+    args = parser.parse_args()
+
+    filenames = structure_files(args.structures)
+    if not filenames:
+        parser.error("no structure files found")
+    if args.images:
+        os.makedirs(args.images, exist_ok=True)
+
+    # Load the word list once, and hand it to every worker
+    vocabulary = Crossword(filenames[0], args.words, cache_dir=args.cache)
+    options = {
+        "arc_consistency": args.arc_consistency,
+        "inference": None if args.inference == "none" else args.inference
+    }
+    jobs = [
+        (filename, args.solutions, options,
+         None if args.seed is None else args.seed + k,
+         args.cache, args.images)
+        for k, filename in enumerate(filenames)
+    ]
+
+    # Solve structures in parallel, writing puzzles as each structure finishes
+    with multiprocessing.Pool(args.workers, initializer=init_worker,
+                              initargs=(vocabulary,)) as pool:
+        for source, puzzles in pool.imap_unordered(generate, jobs):
+            if args.format == "json":
+                write_json(source, puzzles)
+            else:
+                write_text(source, puzzles)
+            sys.stdout.flush()
+
+
+def structure_files(paths):
+    """
+    Return the structure files at `paths`, each either a file or a directory.
+    """
+    filenames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filenames.append(path)
+            continue
+        filenames.extend(sorted(
+            os.path.join(path, filename)
+            for filename in os.listdir(path)
+            if filename.endswith(".txt")
+        ))
+    return filenames
+
+
+def init_worker(vocabulary):
+    """
+    Remember the vocabulary for the jobs run by this worker process.
+    """
+    global VOCABULARY
+    VOCABULARY = vocabulary
+
+
+def generate(job):
+    """
+    Generate up to `count` puzzles for one structure, each sharing no words
+    with the ones before it, stopping early if there are no more.
+    Return a tuple (source, puzzles), where each puzzle is a tuple of the
+    grid's rows and a list of (i, j, direction, word) entries.
+    """
+    structure, count, options, seed, cache_dir, images = job
+    crossword = VOCABULARY.with_structure(structure, cache_dir=cache_dir)
+
+    puzzles = []
+    used = set()
+    for k in range(count):
+        creator = CrosswordCreator(
+            crossword, seed=None if seed is None else seed + k, **options
+        )
+        creator.exclude(used)
+        assignment = creator.solve()
+        if assignment is None:
+            break
+        used.update(assignment.values())
+        entries = sorted(
+            (var.i, var.j, var.direction, word) for var, word in assignment.items()
+        )
+        puzzles.append((creator.grid_lines(assignment), entries))
+        if images:
+            name = os.path.splitext(os.path.basename(structure))[0]
+            creator.save(assignment, os.path.join(images, f"{name}-{k}.png"))
+    return structure, puzzles
+
+
+def write_text(source, puzzles):
+    """
+    Print each puzzle for `source` under a heading.
+    """
+    if not puzzles:
+        print(f"{source}: No solution.")
+        print()
+    for k, (lines, _) in enumerate(puzzles):
+        print(f"{source} #{k}")
+        for line in lines:
+            print(line)
+        print()
+
+
+def write_json(source, puzzles):
+    """
+    Print each puzzle for `source` as one JSON object per line, or a single
+    object with a null grid if there is no solution.
+    """
+    if not puzzles:
+        print(json.dumps({
+            "structure": source, "solution": None, "grid": None, "words": None
+        }))
+    for k, (lines, entries) in enumerate(puzzles):
+        print(json.dumps({
+            "structure": source,
+            "solution": k,
+            "grid": lines,
+            "words": [
+                {"i": i, "j": j, "direction": direction, "word": word}
+                for i, j, direction, word in entries
+            ]
+        }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
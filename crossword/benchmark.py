@@ -0,0 +1,144 @@
+import argparse
+import os
+import random
+import tempfile
+
+from crossword import Crossword
+from generate import CrosswordCreator, SearchLimit
+
+# Solver configurations to compare, by name
+CONFIGS = {
+    "plain": {},
+    "forward": {"inference": "forward"},
+    "mac": {"inference": "mac"},
+    "mac-ac2001": {"inference": "mac", "arc_consistency": "ac2001"},
+    "mac-domwdeg": {"inference": "mac", "variable_ordering": "domwdeg"},
+    "backjumping": {"backjumping": True},
+    "backjumping-domwdeg": {"backjumping": True, "variable_ordering": "domwdeg"}
+}
+
+
+def main():
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Compare crossword solver configurations on generated grids."
+    )
+    parser.add_argument("--words", default=os.path.join("data", "words2.txt"),
+                        help="word list to sample vocabularies from")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 7, 9],
+                        help="width and height of each generated grid")
+    parser.add_argument("--word-counts", type=int, nargs="+", default=[500, 1000, 2000],
+                        help="number of words in each sampled vocabulary")
+    parser.add_argument("--blocks", type=float, default=0.3,
+                        help="fraction of blocked cells in each grid")
+    parser.add_argument("--grids", type=int, default=3,
+                        help="number of grids generated for each size")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS),
+                        choices=list(CONFIGS))
+    parser.add_argument("--max-nodes", type=int, default=5000,
+                        help="give up on a search after visiting this many nodes")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for grids and vocabularies")
+    args = parser.parse_args()
+
+    with open(args.words) as f:
+        vocabulary = sorted(set(f.read().upper().splitlines()))
+
+    print(f"{'size':>4} {'words':>6} {'config':>20} {'solved':>7} {'limited':>7} "
+          f"{'seconds':>9} {'nodes':>8} {'backtracks':>10} {'revisions':>10} "
+          f"{'ac3':>7} {'order':>7} {'check':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.word_counts:
+
+            # Sample a vocabulary, and load it once for every grid
+            words_file = os.path.join(directory, f"words{count}.txt")
+            write_lines(words_file, generate_words(vocabulary, count, seed=args.seed))
+            crossword = None
+
+            for size in args.sizes:
+                structures = []
+                for k in range(args.grids):
+                    structure_file = os.path.join(directory, f"structure{size}-{k}.txt")
+                    write_lines(structure_file, generate_structure(
+                        size, args.blocks, seed=args.seed + k
+                    ))
+                    if crossword is None:
+                        crossword = Crossword(structure_file, words_file)
+                    structures.append(crossword.with_structure(structure_file))
+
+                for name in args.configs:
+                    totals = measure(structures, CONFIGS[name], args.max_nodes)
+                    phases = totals["phase_seconds"]
+                    check = phases.get("consistent_with", 0) + phases.get("conflicts_with", 0)
+                    print(f"{size:>4} {count:>6} {name:>20} "
+                          f"{totals['solved']:>7} {totals['limited']:>7} "
+                          f"{totals['seconds']:>9.4f} {totals['nodes']:>8} "
+                          f"{totals['backtracks']:>10} {totals['revisions']:>10} "
+                          f"{phases.get('ac3', 0):>7.3f} "
+                          f"{phases.get('order_domain_values', 0):>7.3f} "
+                          f"{check:>7.3f}")
+
+
+def generate_structure(size, blocks, seed=None):
+    """
+    Return the rows of a `size` by `size` crossword structure with roughly
+    `blocks` of its cells blocked, placed with rotational symmetry as in
+    published crosswords.
+    """
+    rng = random.Random(seed)
+    grid = [["_"] * size for _ in range(size)]
+    for i in range(size):
+        for j in range(size):
+            if (i, j) <= (size - 1 - i, size - 1 - j) and rng.random() < blocks:
+                grid[i][j] = grid[size - 1 - i][size - 1 - j] = "#"
+    return ["".join(row) for row in grid]
+
+
+def generate_words(vocabulary, count, seed=None):
+    """
+    Return a random sample of `count` words from `vocabulary`, or all of
+    them if there are fewer.
+    """
+    rng = random.Random(seed)
+    return sorted(rng.sample(vocabulary, min(count, len(vocabulary))))
+
+
+def write_lines(filename, lines):
+    """
+    Write `lines` to `filename`, one per line.
+    """
+    with open(filename, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def measure(structures, config, max_nodes):
+    """
+    Solve each crossword in `structures` with solver options `config`,
+    giving up on any search that visits more than `max_nodes` nodes.
+    Return a dict of the number solved and limited, and the statistics of
+    every search added together.
+    """
+    totals = {
+        "solved": 0, "limited": 0, "seconds": 0.0, "nodes": 0,
+        "backtracks": 0, "revisions": 0, "phase_seconds": dict()
+    }
+    for crossword in structures:
+        creator = CrosswordCreator(crossword, timing=True, **config)
+        creator.node_limit = max_nodes
+        try:
+            if creator.solve() is not None:
+                totals["solved"] += 1
+        except SearchLimit:
+            totals["limited"] += 1
+
+        stats = creator.stats.as_dict()
+        for field in ("seconds", "nodes", "backtracks", "revisions"):
+            totals[field] += stats[field]
+        for phase, seconds in stats["phase_seconds"].items():
+            totals["phase_seconds"][phase] = totals["phase_seconds"].get(phase, 0) + seconds
+    return totals
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,17 @@
+import hashlib
+import os
+import pickle
+
+# Attributes of Crossword computed from each input file, and cached together
+STRUCTURE_FIELDS = (
+    "height", "width", "structure", "variables", "overlaps", "adjacency"
+)
+WORDS_FIELDS = ("words", "words_by_length", "word_indices", "letter_masks")
+
+# Change whenever the cached attributes change, to ignore older cache files
+CACHE_VERSION = 1
+
+
 class Variable():
 
     ACROSS = "across"
@@ -35,9 +49,78 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Overlaps(dict):
+    """
+    Overlaps between pairs of variables, storing only pairs that overlap.
+    Looking up any other pair returns None.
+    """
+
+    def __missing__(self, key):
+        return None
+
+
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, cache_dir=None):
+        """
+        Load a crossword structure and vocabulary list. If `cache_dir` is
+        given, the parsed structure (with its variables and overlaps) and the
+        word index are cached there, keyed by a hash of each file's contents,
+        so later runs with the same files can skip parsing them.
+        """
+        self.load(structure_file, "structure", STRUCTURE_FIELDS,
+                  self.compile_structure, cache_dir)
+        self.load(words_file, "words", WORDS_FIELDS,
+                  self.compile_words, cache_dir)
+
+    def with_structure(self, structure_file, cache_dir=None):
+        """
+        Return a new crossword with the structure in `structure_file` and this
+        crossword's vocabulary, sharing the word index instead of reloading it.
+        """
+        crossword = Crossword.__new__(Crossword)
+        for field in WORDS_FIELDS:
+            setattr(crossword, field, getattr(self, field))
+        crossword.load(structure_file, "structure", STRUCTURE_FIELDS,
+                       crossword.compile_structure, cache_dir)
+        return crossword
+
+    def load(self, filename, kind, fields, compile, cache_dir):
+        """
+        Set `fields` by calling `compile(filename)`, or from the cache file
+        for `filename`'s contents in `cache_dir` if there is one.
+        """
+        if cache_dir is None:
+            compile(filename)
+            return
+
+        # Name the cache file after a hash of the input
+        with open(filename, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        path = os.path.join(cache_dir, f"{kind}-v{CACHE_VERSION}-{digest}.pickle")
+
+        try:
+            with open(path, "rb") as f:
+                cached = pickle.load(f)
+            for field in fields:
+                setattr(self, field, cached[field])
+            return
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            pass
+
+        # Compile, and write the cache file atomically for other processes
+        compile(filename)
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump({field: getattr(self, field) for field in fields}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def compile_structure(self, structure_file):
+        """
+        Parse the structure file, and find its variables and their overlaps.
+        """
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -57,10 +140,6 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
-
         # Determine variable set
         self.variables = set()
         for i in range(self.height):
@@ -104,30 +183,73 @@ class Crossword():
                             length=length
                         ))
 
+        # Find the variables covering each cell
+        covering = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                covering.setdefault(cell, []).append((var, k))
+
         # Compute overlaps for each word
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored, and also listed in `adjacency`:
+        # each variable's (neighbour, i, j) for every variable it overlaps.
+        self.overlaps = Overlaps()
+        self.adjacency = {var: [] for var in self.variables}
+        for variables in covering.values():
+            for v1, i in variables:
+                for v2, j in variables:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (i, j)
+                        self.adjacency[v1].append((v2, i, j))
+
+    def compile_words(self, words_file):
+        """
+        Read the vocabulary list, and index it by length and letter.
+        """
+
+        # Save vocabulary list
+        with open(words_file) as f:
+            self.words = set(f.read().upper().splitlines())
+
+        # Index words by length, so that a set of words of one length can be
+        # stored as a bitmask over the sorted list of words of that length
+        self.words_by_length = dict()
+        for word in sorted(self.words):
+            self.words_by_length.setdefault(len(word), []).append(word)
+        self.word_indices = {
+            word: index
+            for words in self.words_by_length.values()
+            for index, word in enumerate(words)
+        }
+
+        # For each (length, position), a dict from each letter to a bitmask of
+        # the words of that length with that letter at that position
+        self.letter_masks = dict()
+        for length, words in self.words_by_length.items():
+            for position in range(length):
+                bits = dict()
+                for index, word in enumerate(words):
+                    letter = word[position]
+                    if letter not in bits:
+                        bits[letter] = bytearray((len(words) + 7) // 8)
+                    bits[letter][index // 8] |= 1 << (index % 8)
+                self.letter_masks[length, position] = {
+                    letter: int.from_bytes(array, "little")
+                    for letter, array in bits.items()
+                }
+
+    def length_mask(self, length):
+        """Return a bitmask of all words with the given length."""
+        return (1 << len(self.words_by_length.get(length, []))) - 1
+
+    def mask_words(self, length, mask):
+        """Return the list of words of `length` whose bits are set in `mask`."""
+        words = self.words_by_length.get(length, [])
+        bits = bin(mask)[:1:-1]
+        return [words[index] for index, bit in enumerate(bits) if bit == "1"]
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return set(v for v, _, _ in self.adjacency[var])
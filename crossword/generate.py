@@ -1,21 +1,203 @@
-import sys
+import argparse
+import multiprocessing
+import queue
+import random
+import time
+from collections import OrderedDict, deque
 from operator import itemgetter, attrgetter
 
 from crossword import *
 
+# Factor by which the node limit grows on each restart
+RESTART_GROWTH = 1.5
+
+# Node limit before the first restart of a portfolio search
+PORTFOLIO_RESTART_NODES = 100
+
+# Maximum number of failed partial assignments remembered by backjumping
+NOGOOD_LIMIT = 10000
+
+# Methods whose running time is recorded when a search is timed
+TIMED_PHASES = (
+    "ac3", "select_unassigned_variable", "order_domain_values",
+    "consistent_with", "conflicts_with", "infer"
+)
+
+
+class SearchLimit(Exception):
+    """Raised when a search visits more nodes than its limit."""
+
+
+class SolverStats():
+    """
+    Counts and timings collected while solving a crossword.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.revisions = 0
+        self.restarts = 0
+        self.seconds = 0.0
+
+        # Seconds spent in, and number of calls to, each timed method
+        self.phase_seconds = dict()
+        self.phase_calls = dict()
+
+    def timed(self, phase, method):
+        """
+        Return `method` wrapped to add its running time to `phase`.
+        """
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return method(*args)
+            finally:
+                self.phase_seconds[phase] = (
+                    self.phase_seconds.get(phase, 0.0) + time.perf_counter() - start
+                )
+                self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+        return wrapper
+
+    def as_dict(self):
+        """
+        Return the statistics as a dict of plain values.
+        """
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "revisions": self.revisions,
+            "restarts": self.restarts,
+            "seconds": self.seconds,
+            "phase_seconds": dict(self.phase_seconds),
+            "phase_calls": dict(self.phase_calls)
+        }
+
+    def report(self):
+        """
+        Return a human-readable summary of the statistics.
+        """
+        lines = [
+            f"Nodes: {self.nodes}",
+            f"Backtracks: {self.backtracks}",
+            f"Revisions: {self.revisions}",
+            f"Restarts: {self.restarts}",
+            f"Seconds: {self.seconds:.4f}"
+        ]
+        for phase in TIMED_PHASES:
+            if phase in self.phase_calls:
+                lines.append(
+                    f"  {phase}: {self.phase_seconds[phase]:.4f}s "
+                    f"in {self.phase_calls[phase]} calls"
+                )
+        return "\n".join(lines)
+
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, arc_consistency="ac3", inference=None,
+                 seed=None, restart_nodes=None, backjumping=False,
+                 nogood_limit=NOGOOD_LIMIT, variable_ordering="mrv",
+                 timing=False):
         """
         Create new CSP crossword generate.
+        `arc_consistency` selects the algorithm `ac3` uses to revise arcs:
+        "ac3", or "ac2001" to remember the last support found for each value.
+        `inference` selects what `backtrack` does after each assignment:
+        None, "forward" for forward checking, or "mac" to maintain arc
+        consistency.
+        If `seed` is given, ties between variables and between values are
+        broken randomly. If `restart_nodes` is given, `solve` restarts the
+        search whenever it visits that many nodes, growing the limit each time.
+        If `backjumping` is True, `backtrack` uses conflict-directed
+        backjumping and remembers up to `nogood_limit` failed partial
+        assignments; it checks consistency only against assigned variables,
+        so it can't be combined with `inference`.
+        `variable_ordering` is "mrv" (minimum remaining values, then highest
+        degree) or "domwdeg" (smallest domain size over the weight of the
+        constraints with unassigned neighbours, where a constraint's weight
+        grows each time it rules out a word or empties a domain).
+        `self.stats` counts the nodes, backtracks, revisions and restarts of
+        `solve`. If `timing` is True, it also records the time spent in each
+        of TIMED_PHASES; phases called by other phases (such as `ac3` from
+        `infer`) are counted in both.
         """
+        if backjumping and inference is not None:
+            raise ValueError("backjumping can't be combined with inference")
         self.crossword = crossword
+        self.arc_consistency = arc_consistency
+        self.inference = inference
+        self.random = random.Random(seed) if seed is not None else None
+        self.restart_nodes = restart_nodes
+        self.backjumping = backjumping
+        self.nogood_limit = nogood_limit
+        self.variable_ordering = variable_ordering
+
+        # Failed partial assignments, least recently used first, each as a
+        # frozenset of (variable, word) pairs; and for each pair, the
+        # nogoods it appears in
+        self.nogoods = OrderedDict()
+        self.nogood_index = dict()
+
+        # Conflict counts of constraints between pairs of variables, and the
+        # key in `weights` of the constraint between each pair of neighbours
+        self.weights = dict()
+        self.constraints = {
+            (x, y): frozenset((x, y))
+            for x in self.crossword.variables
+            for y, _, _ in self.crossword.adjacency[x]
+        }
+
+        # Nodes visited by the search, and the limit before it restarts
+        self.nodes = 0
+        self.node_limit = None
+
+        # Previous domains of narrowed variables, so search can undo changes
+        self.trail = []
+
+        # Words used by the assignment being searched
+        self.used_words = set()
+
+        # Letter counts of domains at each position, see letter_histogram
+        self.histograms = dict()
+
+        # Last supports found by AC-2001
+        self.last_support = dict()
+
+        # Statistics about the search, timing each phase if asked to
+        self.stats = SolverStats()
+        if timing:
+            for phase in TIMED_PHASES:
+                setattr(self, phase, self.stats.timed(phase, getattr(self, phase)))
+
+        # Each domain is a bitmask over the words with the variable's length
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.crossword.length_mask(var.length)
             for var in self.crossword.variables
         }
 
+    def narrow(self, var, mask):
+        """
+        Replace the domain of `var` with `mask`, recording the old domain on
+        the trail.
+        """
+        self.trail.append((var, self.domains[var]))
+        self.domains[var] = mask
+
+    def undo(self, mark):
+        """
+        Restore every domain narrowed since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, mask = self.trail.pop()
+            self.domains[var] = mask
+
+    def domain_words(self, var):
+        """
+        Return the list of words in the domain of `var`.
+        """
+        return self.crossword.mask_words(var.length, self.domains[var])
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -32,67 +214,77 @@ class CrosswordCreator():
                 letters[i][j] = word[k]
         return letters
 
+    def grid_lines(self, assignment):
+        """
+        Return the rows of a crossword assignment as strings, with blocked
+        cells shown as "█".
+        """
+        letters = self.letter_grid(assignment)
+        return [
+            "".join(
+                (letters[i][j] or " ") if self.crossword.structure[i][j] else "█"
+                for j in range(self.crossword.width)
+            )
+            for i in range(self.crossword.height)
+        ]
+
     def print(self, assignment):
         """
         Print crossword assignment to the terminal.
         """
-        letters = self.letter_grid(assignment)
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
-                if self.crossword.structure[i][j]:
-                    print(letters[i][j] or " ", end="")
-                else:
-                    print("█", end="")
-            print()
+        for line in self.grid_lines(assignment):
+            print(line)
 
     def save(self, assignment, filename):
         """
         Save crossword assignment to an image file.
         """
-        from PIL import Image, ImageDraw, ImageFont
-        cell_size = 100
-        cell_border = 2
-        interior_size = cell_size - 2 * cell_border
-        letters = self.letter_grid(assignment)
+        import render
+        render.save(self.crossword.structure, self.letter_grid(assignment), filename)
 
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.crossword.width * cell_size,
-             self.crossword.height * cell_size),
-            "black"
-        )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
-        draw = ImageDraw.Draw(img)
-
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
-
-                rect = [
-                    (j * cell_size + cell_border,
-                     i * cell_size + cell_border),
-                    ((j + 1) * cell_size - cell_border,
-                     (i + 1) * cell_size - cell_border)
-                ]
-                if self.crossword.structure[i][j]:
-                    draw.rectangle(rect, fill="white")
-                    if letters[i][j]:
-                        _, _, w, h = draw.textbbox((0, 0), letters[i][j], font=font)
-                        draw.text(
-                            (rect[0][0] + ((interior_size - w) / 2),
-                             rect[0][1] + ((interior_size - h) / 2) - 10),
-                            letters[i][j], fill="black", font=font
-                        )
-
-        img.save(filename)
+    def save_many(self, assignments, filenames, workers=None):
+        """
+        Save each assignment to the matching image file, rendering them in
+        a pool of `workers` processes (default: one per CPU).
+        """
+        import render
+        jobs = [
+            (self.crossword.structure, self.letter_grid(assignment), filename)
+            for assignment, filename in zip(assignments, filenames)
+        ]
+        for _ in render.save_many(jobs, workers):
+            pass
 
     def solve(self):
         """
         Enforce node and arc consistency, and then solve the CSP.
         """
-        self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        start = time.perf_counter()
+        try:
+            self.enforce_node_consistency()
+            self.ac3()
+            if self.restart_nodes is None:
+                return self.backtrack(dict())
+            return self.restart_search()
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+    def restart_search(self):
+        """
+        Run `backtrack` with a node limit, restarting from the current
+        domains with a larger limit (and, if seeded, different tie-breaks)
+        each time the limit is reached.
+        """
+        mark = len(self.trail)
+        self.node_limit = self.restart_nodes
+        while True:
+            self.nodes = 0
+            try:
+                return self.backtrack(dict())
+            except SearchLimit:
+                self.stats.restarts += 1
+                self.undo(mark)
+                self.node_limit = int(self.node_limit * RESTART_GROWTH) + 1
 
     def enforce_node_consistency(self):
         """
@@ -100,18 +292,20 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        # Loop over the variables, removing words that don't match the length of the word
-        words_to_remove = []
+        # Domains only index words of the variable's own length, so masking
+        # with every word of that length drops anything else
         for var in self.domains:
-            for word in self.domains[var]:
-                if len(word) != var.length:
-                    words_to_remove.append((var, word))
-    
-        # Remove the words
-        for var, word in words_to_remove:
-            self.domains[var].remove(word)
-        
-        #raise NotImplementedError
+            self.domains[var] &= self.crossword.length_mask(var.length)
+
+    def exclude(self, words):
+        """
+        Remove `words` from every domain, so that no solution found
+        afterwards uses any of them.
+        """
+        for var in self.domains:
+            for word in words:
+                if len(word) == var.length and word in self.crossword.word_indices:
+                    self.domains[var] &= ~(1 << self.crossword.word_indices[word])
 
     def revise(self, x, y):
         """
@@ -123,24 +317,62 @@ class CrosswordCreator():
         False if no revision was made.
         """
 
-        # Loop over words in x's domain, removing any that are not consistent with y's domain given the arc.
-        words_to_remove = []
-        for wordx in self.domains[x]:
-            is_match = False
-            for wordy in self.domains[y]:
-                # if the ith character of x's word === the jth character of y's word, set match to True
-                if wordx[self.crossword.overlaps[x, y][0]] == wordy[self.crossword.overlaps[x, y][1]]:
-                    is_match = True
-            if is_match == False:
-                words_to_remove.append(wordx)
-
-        # Remove the words
-        for word in words_to_remove:
-            self.domains[x].remove(word)
-            
+        self.stats.revisions += 1
+        i, j = self.crossword.overlaps[x, y]
+        x_masks = self.crossword.letter_masks.get((x.length, i), {})
+        y_masks = self.crossword.letter_masks.get((y.length, j), {})
+
+        # Keep the words of x whose letter at the overlap is the letter at
+        # the overlap of some word still in y's domain
+        supported = 0
+        for letter, x_mask in x_masks.items():
+            if not self.domains[x] & x_mask:
+                continue
+            y_mask = y_masks.get(letter, 0)
+            if self.domains[y] & y_mask:
+                supported |= x_mask
+
         # Return true if words were removed otherwise false
-        if words_to_remove: return True 
-        else: return False
+        revised = self.domains[x] & supported
+        if revised == self.domains[x]:
+            return False
+        self.narrow(x, revised)
+        return True
+
+    def revise_ac2001(self, x, y):
+        """
+        Like `revise`, but remember the last word of y found to support each
+        letter of x at the overlap. While that word is still in y's domain
+        the letter stays supported, which is a single bit test instead of an
+        AND over the whole domain.
+        """
+        self.stats.revisions += 1
+        i, j = self.crossword.overlaps[x, y]
+        x_masks = self.crossword.letter_masks.get((x.length, i), {})
+        y_masks = self.crossword.letter_masks.get((y.length, j), {})
+
+        supported = 0
+        for letter, x_mask in x_masks.items():
+            if not self.domains[x] & x_mask:
+                continue
+
+            # Check the remembered support first
+            last = self.last_support.get((x, y, letter))
+            if last is not None and (self.domains[y] >> last) & 1:
+                supported |= x_mask
+                continue
+
+            # Otherwise look for a new one
+            common = self.domains[y] & y_masks.get(letter, 0)
+            if common:
+                self.last_support[x, y, letter] = (common & -common).bit_length() - 1
+                supported |= x_mask
+
+        revised = self.domains[x] & supported
+        if revised == self.domains[x]:
+            return False
+        self.narrow(x, revised)
+        return True
 
     def ac3(self, arcs=None):
         """
@@ -152,29 +384,34 @@ class CrosswordCreator():
         return False if one or more domains end up empty.
         """
 
-        # Create a queue
+        revise = self.revise_ac2001 if self.arc_consistency == "ac2001" else self.revise
+
+        # Create a worklist, starting with every arc between overlapping variables
         if arcs is None:
-            arcs = self.crossword.overlaps.items()
-
-        # Loop until no changes are made
-        change_tracker = True
-        while change_tracker:
-            change_tracker = False
-            for key, value in arcs:
-                    # If no overlap in pair, move to the next pair
-                    if value is None:
-                        continue
-                    else:
-                        # Call revise, and loop round again if there was a revision
-                        if self.revise(key[0], key[1]):
-                            change_tracker = True
+            arcs = [
+                (x, y)
+                for x in self.crossword.variables
+                for y, _, _ in self.crossword.adjacency[x]
+            ]
+        worklist = deque(arcs)
+        queued = set(worklist)
+
+        # Revise arcs until the worklist is empty. When x's domain shrinks, only
+        # arcs into x from its other neighbours can be affected.
+        while worklist:
+            x, y = worklist.popleft()
+            queued.discard((x, y))
+            if revise(x, y):
+                if not self.domains[x]:
+                    self.add_weight(x, y)
+                    return False
+                for z, _, _ in self.crossword.adjacency[x]:
+                    if z != y and (z, x) not in queued:
+                        worklist.append((z, x))
+                        queued.add((z, x))
 
         # Return false if enforced but some empty domains.
-        for var in self.domains:
-            if self.domains[var] is None:
-                return False
-
-        return True
+        return all(self.domains.values())
 
     def assignment_complete(self, assignment):
         """
@@ -201,15 +438,14 @@ class CrosswordCreator():
             if len(assignment[var]) != var.length:
                 return False
             
-            # Get neighbours and loop over them
-            neighbours = self.neighbours(var)
-            for n in neighbours:
-                
+            # Loop over the neighbours
+            for neighbour, i, j in self.crossword.adjacency[var]:
+
                 # If neighbour has an assignment, check if the intersecting letters match
-                if n[1] in assignment:
+                if neighbour in assignment:
 
                     # If overlaps don't match, return false
-                    if not self.check_letter_overlaps(n[0], n[1], assignment[n[0]], assignment[n[1]]):
+                    if assignment[var][i] != assignment[neighbour][j]:
                         return False
                     
         # Check if values are unique
@@ -224,13 +460,10 @@ class CrosswordCreator():
         Returns None if no intersections
         """
 
-        neighbours = {}
-        for pair in self.crossword.overlaps:
-            if varx == pair[1]:
-                continue
-            if self.crossword.overlaps[varx, pair[1]]:
-                neighbours[varx, pair[1]] = self.crossword.overlaps[varx, pair[1]]
-        
+        neighbours = {
+            (varx, vary): (i, j) for vary, i, j in self.crossword.adjacency[varx]
+        }
+
         if len(neighbours) == 0:
             return None
 
@@ -259,37 +492,40 @@ class CrosswordCreator():
         """
 
         # Initialise a dict. This will contain words and number of words they rule out
-        words_with_ruledout_count = {}
+        words = self.domain_words(var)
+        words_with_ruledout_count = dict.fromkeys(words, 0)
 
-        # Loop over the words in the domain for this variable
-        for wordx in self.domains[var]:
-
-            # Loop over all other variables to find those that overlap
-            for vary in self.domains:
-
-                # Check those that do overlap, while skipping overlapping vars
-                if var == vary:
-                    continue
-
-                if self.crossword.overlaps[var, vary]:
-                    
-                    # Add if not already in dict
-                    if wordx not in words_with_ruledout_count:
-                        words_with_ruledout_count[wordx] = 0
-
-                    # Loop over the domain of the neighbour
-                    for wordy in self.domains[vary]:
-
-                        # If no overlap, increment the counter
-                        if not self.check_letter_overlaps(var, vary, wordx, wordy):
-                            words_with_ruledout_count[wordx] += 1
+        # For each unassigned neighbour, a word rules out every word in the
+        # neighbour's domain without the same letter at the overlap
+        for vary, i, j in self.crossword.adjacency[var]:
+            if vary in assignment:
+                continue
+            size = self.domains[vary].bit_count()
+            histogram = self.letter_histogram(vary, j)
+            for wordx in words:
+                words_with_ruledout_count[wordx] += size - histogram.get(wordx[i], 0)
 
-        # Use sorted to sort by count        
-        words_with_ruledout_count = sorted(words_with_ruledout_count.items(), key=lambda count: count[1])
+        # Sort by count, breaking ties randomly if seeded
+        if self.random:
+            self.random.shuffle(words)
+        return sorted(words, key=words_with_ruledout_count.__getitem__)
 
-        # Return as a list using list compression
-        words = [t[0] for t in words_with_ruledout_count]
-        return words
+    def letter_histogram(self, var, position):
+        """
+        Return a dict from each letter to the number of words in the domain
+        of `var` with that letter at `position`. Histograms are cached, and
+        only recounted once the domain has changed.
+        """
+        mask = self.domains[var]
+        cached = self.histograms.get((var, position))
+        if cached is not None and cached[0] == mask:
+            return cached[1]
+        histogram = {
+            letter: (mask & letter_mask).bit_count()
+            for letter, letter_mask in self.crossword.letter_masks.get((var.length, position), {}).items()
+        }
+        self.histograms[var, position] = (mask, histogram)
+        return histogram
 
     def select_unassigned_variable(self, assignment):
         """
@@ -300,25 +536,53 @@ class CrosswordCreator():
         return values.
         """
 
+        if self.variable_ordering == "domwdeg":
+            return self.select_by_weighted_degree(assignment)
+
         # Make a list for the tuples
         remaining_vars = []
 
         # Loop over domains to find unassigned variables
         for var in self.domains:
             if var not in assignment:
-                words_count = len(self.domains[var])
-                neighbour_count = len(self.neighbours(var))
+                words_count = self.domains[var].bit_count()
+                neighbour_count = len(self.crossword.adjacency[var])
 
-                # Add a tuple with the var and the counts
-                remaining_vars.append((var, words_count, neighbour_count))
+                # Add a tuple with the var and the counts, and a random
+                # tie-break if seeded
+                tie_break = self.random.random() if self.random else 0
+                remaining_vars.append((var, words_count, -neighbour_count, tie_break))
         
-        # Sort by word cound, then neighbour count
-        remaining_vars = sorted(remaining_vars, key=itemgetter(1,2))
+        # Sort by word count, then by highest neighbour count
+        remaining_vars = sorted(remaining_vars, key=itemgetter(1,2,3))
 
         # Return the var from the 1st item in the list
         return remaining_vars[0][0]
         
 
+    def select_by_weighted_degree(self, assignment):
+        """
+        Return the unassigned variable with the smallest ratio of domain size
+        to weighted degree: the total weight of its constraints with
+        unassigned neighbours, where each constraint starts with weight 1.
+        """
+        best = None
+        for var in self.domains:
+            if var in assignment:
+                continue
+            weighted_degree = sum(
+                self.weights.get(self.constraints[var, neighbour], 1)
+                for neighbour, _, _ in self.crossword.adjacency[var]
+                if neighbour not in assignment
+            )
+            score = (
+                self.domains[var].bit_count() / max(weighted_degree, 1),
+                self.random.random() if self.random else 0
+            )
+            if best is None or score < best[0]:
+                best = (score, var)
+        return best[1]
+
     def backtrack(self, assignment):
         """
         Using Backtracking Search, take as input a partial assignment for the
@@ -329,8 +593,152 @@ class CrosswordCreator():
         If no assignment is possible, return None.
         """
 
+        # Track the words in use, which `search` then updates as it goes
+        self.used_words = set(assignment.values())
+        if not self.backjumping:
+            return self.search(assignment)
+
+        # For backjumping, also track which variable uses each word, and
+        # how many variables were assigned before each one
+        self.word_owners = {word: var for var, word in assignment.items()}
+        self.depths = {var: k for k, var in enumerate(assignment)}
+        result, _ = self.backjump(assignment)
+        return result
+
+    def backjump(self, assignment):
+        """
+        Recursive step of `backtrack` with conflict-directed backjumping.
+
+        Return a tuple (result, conflicts). If the search failed, `conflicts`
+        is the set of assigned variables whose values caused the failure;
+        callers whose own variable isn't among them return straight away,
+        since trying their other values can't help.
+        """
+
+        if self.assignment_complete(assignment):
+            return assignment, set()
+
+        # Give up on this attempt if it has run out of nodes
+        self.nodes += 1
+        self.stats.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchLimit
+
+        var = self.select_unassigned_variable(assignment)
+        conflicts = set()
+        for word in self.order_domain_values(var, assignment):
+
+            # Skip words that conflict with assigned variables, or complete
+            # a known nogood, remembering the variables responsible
+            culprits = self.conflicts_with(var, word, assignment)
+            if culprits is None:
+                culprits = self.matching_nogood(var, word, assignment)
+            if culprits is not None:
+                conflicts |= culprits
+                continue
+
+            self.depths[var] = len(assignment)
+            assignment[var] = word
+            self.used_words.add(word)
+            self.word_owners[word] = var
+
+            result, below = self.backjump(assignment)
+            if result is not None:
+                return result, set()
+
+            self.used_words.discard(word)
+            del self.word_owners[word]
+            del self.depths[var]
+            del assignment[var]
+            self.stats.backtracks += 1
+
+            # Jump back over this variable if it didn't cause the failure
+            if var not in below:
+                return None, below
+            conflicts |= below - {var}
+
+        # No word works given the conflicting variables' words
+        self.add_nogood(frozenset((v, assignment[v]) for v in conflicts))
+        return None, conflicts
+
+    def conflicts_with(self, var, word, assignment):
+        """
+        Return None if assigning `word` to `var` is consistent with
+        `assignment`. Otherwise return a set holding the assigned variable
+        it conflicts with (the earliest assigned, if several), and increase
+        the weight of that constraint if they are neighbours.
+        """
+        culprits = []
+        owner = self.word_owners.get(word)
+        if owner is not None:
+            culprits.append(owner)
+        for neighbour, i, j in self.crossword.adjacency[var]:
+            if neighbour in assignment and assignment[neighbour][j] != word[i]:
+                culprits.append(neighbour)
+        if not culprits:
+            return None
+
+        culprit = min(culprits, key=self.depths.__getitem__)
+
+        # Only constraints between neighbours are weighted, and a word's
+        # owner needn't be a neighbour
+        if (var, culprit) in self.constraints:
+            self.add_weight(var, culprit)
+        return {culprit}
+
+    def add_weight(self, x, y):
+        """
+        Increase the weight of the constraint between neighbours `x` and
+        `y`, after it ruled out a word or emptied a domain. Only domwdeg
+        ordering reads the weights, so they aren't kept otherwise.
+        """
+        if self.variable_ordering != "domwdeg":
+            return
+        constraint = self.constraints[x, y]
+        self.weights[constraint] = self.weights.get(constraint, 1) + 1
+
+    def matching_nogood(self, var, word, assignment):
+        """
+        Return None unless assigning `word` to `var` completes a remembered
+        nogood. Otherwise return the set of the nogood's other variables.
+        """
+        for nogood in self.nogood_index.get((var, word), ()):
+            if all(v == var or assignment.get(v) == w for v, w in nogood):
+                self.nogoods.move_to_end(nogood)
+                return {v for v, _ in nogood if v != var}
+        return None
+
+    def add_nogood(self, nogood):
+        """
+        Remember a partial assignment that can't be extended to a solution,
+        forgetting the least recently used nogood if there are too many.
+        """
+        if not nogood or nogood in self.nogoods or self.nogood_limit <= 0:
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.nogood_index.setdefault(pair, set()).add(nogood)
+        while len(self.nogoods) > self.nogood_limit:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for pair in evicted:
+                self.nogood_index[pair].discard(evicted)
+                if not self.nogood_index[pair]:
+                    del self.nogood_index[pair]
+
+    def search(self, assignment):
+        """
+        Recursive step of `backtrack`, given a consistent partial assignment
+        whose words are `self.used_words`.
+        """
+
         if self.assignment_complete(assignment):
             return assignment
+
+        # Give up on this attempt if it has run out of nodes
+        self.nodes += 1
+        self.stats.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchLimit
             
         # Pick a variable that hasn't been assigned (use select unassigned variable)
         var = self.select_unassigned_variable(assignment)
@@ -341,43 +749,226 @@ class CrosswordCreator():
         # Loop over the words
         for word in words:
 
-            # Add the word to the temp_assignment and check if it's consistent
+            # Check only the new word against the rest of the assignment,
+            # which is already consistent
+            if not self.consistent_with(var, word, assignment):
+                continue
+
+            # Add the word to the assignment
             assignment[var] = word
-            if self.consistent(assignment):
-                
-                # Call backtrack with this new assignment.
-                result = self.backtrack(assignment)
+            self.used_words.add(word)
+
+            # Prune domains, and call search if nothing became empty
+            mark = len(self.trail)
+            if self.infer(var, word, assignment):
+                result = self.search(assignment)
 
                 if result is not None:
                 # If result is not a failure, return the result (because it's recursive result will always be complete)
                     return result
-                    
+
+            # Restore the domains pruned for this word
+            self.undo(mark)
+
+            self.used_words.discard(word)
             del assignment[var]
+            self.stats.backtracks += 1
         return None
 
-def main():
+    def consistent_with(self, var, word, assignment):
+        """
+        Return True if assigning `word` to `var` keeps a consistent
+        `assignment` consistent: the word has the right length, is not used
+        by another variable (per `self.used_words`), and agrees with every
+        assigned neighbour at their overlap. Return False otherwise.
+        """
+        if len(word) != var.length or word in self.used_words:
+            return False
+        for neighbour, i, j in self.crossword.adjacency[var]:
+            if neighbour in assignment and assignment[neighbour][j] != word[i]:
+                if self.variable_ordering == "domwdeg":
+                    self.add_weight(var, neighbour)
+                return False
+        return True
+
+    def infer(self, var, word, assignment):
+        """
+        Prune the domains of unassigned variables after `word` is assigned
+        to `var`, according to `self.inference`. Changes are recorded on the
+        trail so `backtrack` can undo them.
+
+        Return False if some domain becomes empty; return True otherwise.
+        """
+        if self.inference is None:
+            return True
 
-    # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+        # The variable's domain becomes just its word, which no other
+        # variable of the same length can use any more
+        bit = 1 << self.crossword.word_indices[word]
+        self.narrow(var, self.domains[var] & bit)
+        changed = [var]
+        for other in self.domains:
+            if other == var or other in assignment or other.length != var.length:
+                continue
+            if self.domains[other] & bit:
+                self.narrow(other, self.domains[other] & ~bit)
+                if not self.domains[other]:
+                    return False
+                changed.append(other)
+
+        # Forward checking: make unassigned neighbours consistent with var
+        if self.inference == "forward":
+            revise = self.revise_ac2001 if self.arc_consistency == "ac2001" else self.revise
+            for neighbour, _, _ in self.crossword.adjacency[var]:
+                if neighbour not in assignment:
+                    revise(neighbour, var)
+                    if not self.domains[neighbour]:
+                        self.add_weight(neighbour, var)
+                        return False
+            return True
+
+        # Maintaining arc consistency: propagate from every changed domain
+        arcs = [
+            (neighbour, changed_var)
+            for changed_var in changed
+            for neighbour, _, _ in self.crossword.adjacency[changed_var]
+            if neighbour not in assignment
+        ]
+        return self.ac3(arcs)
+
+def main():
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(description="Generate a crossword puzzle.")
+    parser.add_argument("structure", help="text file of the crossword's structure")
+    parser.add_argument("words", help="text file of words, one per line")
+    parser.add_argument("output", nargs="?", default=None,
+                        help="image file to save the crossword to")
+    parser.add_argument("--inference", choices=["none", "forward", "mac"],
+                        default=None,
+                        help="pruning to do after each assignment during search "
+                             "(default: none, or mac for the first portfolio search)")
+    parser.add_argument("--arc-consistency", choices=["ac3", "ac2001"],
+                        default=None, help="arc consistency algorithm (default: ac3)")
+    parser.add_argument("--cache", default=None, metavar="DIR",
+                        help="directory to cache parsed structures and word lists in")
+    parser.add_argument("--backjumping", action="store_true",
+                        help="use conflict-directed backjumping with nogood learning")
+    parser.add_argument("--variable-ordering", choices=["mrv", "domwdeg"],
+                        default=None, help="variable ordering heuristic (default: mrv)")
+    parser.add_argument("--portfolio", type=int, default=None, metavar="N",
+                        help="race N differently configured searches in parallel; "
+                             "the search options above apply to the first one")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for tie-breaking and portfolio searches")
+    parser.add_argument("--stats", action="store_true",
+                        help="print search statistics and time spent in each phase")
+    args = parser.parse_args()
+    if args.stats and args.portfolio:
+        parser.error("--stats can't be combined with --portfolio")
+    if args.backjumping and args.inference not in (None, "none"):
+        parser.error("--backjumping can't be combined with --inference")
+
+    # Collect the search options that were given
+    options = dict()
+    if args.inference is not None:
+        options["inference"] = None if args.inference == "none" else args.inference
+    if args.arc_consistency is not None:
+        options["arc_consistency"] = args.arc_consistency
+    if args.backjumping:
+        options["backjumping"] = True
+    if args.variable_ordering is not None:
+        options["variable_ordering"] = args.variable_ordering
 
     # Generate crossword
-    crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    crossword = Crossword(args.structure, args.words, cache_dir=args.cache)
+    creator = CrosswordCreator(
+        crossword, seed=args.seed, timing=args.stats, **options
+    )
+    if args.portfolio:
+        assignment = solve_portfolio(
+            args.structure, args.words, args.portfolio,
+            seed=args.seed or 0, cache_dir=args.cache, first=options
+        )
+    else:
+        assignment = creator.solve()
 
     # Print result
     if assignment is None:
         print("No solution.")
     else:
         creator.print(assignment)
-        if output:
-            creator.save(assignment, output)
+        if args.output:
+            creator.save(assignment, args.output)
+    if args.stats:
+        print(creator.stats.report())
+
+
+def portfolio_configs(size, seed=0, first=None):
+    """
+    Return `size` different keyword arguments for CrosswordCreator. The
+    first is a deterministic search with the options in `first`, using MAC
+    unless they say otherwise; the rest vary inference and arc consistency
+    and use random tie-breaks with restarts.
+    """
+    first = first or dict()
+
+    # Backjumping can't be combined with inference, so it doesn't get MAC
+    default = dict() if first.get("backjumping") else {"inference": "mac"}
+    configs = [{**default, **first}]
+    for k in range(1, size):
+        configs.append({
+            "inference": "mac" if k % 2 else "forward",
+            "arc_consistency": "ac2001" if k % 4 >= 2 else "ac3",
+            "seed": seed + k,
+            "restart_nodes": PORTFOLIO_RESTART_NODES
+        })
+    return configs[:size]
+
+
+def portfolio_worker(structure, words, cache_dir, config, results):
+    """
+    Solve the crossword with one configuration, and put the configuration
+    and the assignment found (or None) on the `results` queue.
+    """
+    crossword = Crossword(structure, words, cache_dir=cache_dir)
+    assignment = CrosswordCreator(crossword, **config).solve()
+    results.put((config, assignment))
+
+
+def solve_portfolio(structure, words, size, seed=0, cache_dir=None, first=None):
+    """
+    Race `size` differently configured searches in separate processes, the
+    first with the CrosswordCreator options in `first` (see portfolio_configs).
+    Return the first assignment found, stopping the other searches, or None
+    if there is no solution.
+    """
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=portfolio_worker,
+            args=(structure, words, cache_dir, config, results),
+            daemon=True
+        )
+        for config in portfolio_configs(size, seed, first)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # Every search is complete, so the first to finish has the answer
+    try:
+        while True:
+            try:
+                _, assignment = results.get(timeout=1)
+                return assignment
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    raise RuntimeError("every portfolio search failed")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+import functools
+import multiprocessing
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Size in pixels of each cell, and of the black border around it
+CELL_SIZE = 100
+CELL_BORDER = 2
+
+# Font used for letters, and its size in points
+FONT_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "assets", "fonts", "OpenSans-Regular.ttf"
+)
+FONT_SIZE = 80
+
+
+@functools.lru_cache(maxsize=None)
+def font(size=FONT_SIZE):
+    """
+    Return the letter font at `size` points, loading it from disk only once.
+    """
+    return ImageFont.truetype(FONT_FILE, size)
+
+
+@functools.lru_cache(maxsize=None)
+def letter_offset(letter):
+    """
+    Return the position of `letter` that centers it in an open cell,
+    relative to the cell's interior. It is measured only once per letter.
+    """
+    interior_size = CELL_SIZE - 2 * CELL_BORDER
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    _, _, w, h = draw.textbbox((0, 0), letter, font=font())
+    return (interior_size - w) / 2, (interior_size - h) / 2 - 10
+
+
+@functools.lru_cache(maxsize=None)
+def tile(letter):
+    """
+    Return the image of a whole open cell, border included, with `letter`
+    centered in it, or left blank if `letter` is None. Each tile is drawn
+    only once.
+    """
+    image = Image.new("RGBA", (CELL_SIZE, CELL_SIZE), "black")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle(
+        [(CELL_BORDER, CELL_BORDER),
+         (CELL_SIZE - CELL_BORDER, CELL_SIZE - CELL_BORDER)],
+        fill="white"
+    )
+
+    # The tile covers the whole cell, so the letter's offset stays positive
+    # and lands on the same subpixel position as it would on the canvas;
+    # every glyph fits within the cell, so none is clipped
+    if letter:
+        dx, dy = letter_offset(letter)
+        draw.text(
+            (CELL_BORDER + dx, CELL_BORDER + dy), letter, fill="black", font=font()
+        )
+    return image
+
+
+def render(structure, letters):
+    """
+    Return an image of a crossword, given its `structure` (rows of True for
+    open cells) and `letters` (rows of letters, or None for empty cells).
+    """
+    height = len(structure)
+    width = len(structure[0]) if structure else 0
+
+    # Paste a ready-made tile into every open cell of a black canvas
+    img = Image.new("RGBA", (width * CELL_SIZE, height * CELL_SIZE), "black")
+    for i in range(height):
+        for j in range(width):
+            if structure[i][j]:
+                img.paste(tile(letters[i][j]), (j * CELL_SIZE, i * CELL_SIZE))
+    return img
+
+
+def save(structure, letters, filename):
+    """
+    Render a crossword and save it to an image file.
+    """
+    render(structure, letters).save(filename)
+
+
+def save_job(job):
+    """
+    Save one crossword, given a tuple (structure, letters, filename).
+    Return the filename.
+    """
+    structure, letters, filename = job
+    save(structure, letters, filename)
+    return filename
+
+
+def save_many(jobs, workers=None):
+    """
+    Save many crosswords in a pool of `workers` processes (default: one per
+    CPU), given an iterable of (structure, letters, filename) tuples.
+    Yield each filename as its image is saved.
+    """
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(save_job, jobs, chunksize=8)
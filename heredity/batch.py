@@ -0,0 +1,90 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+
+from heredity import MODES, SAMPLERS, connected_components, infer, load_data
+
+
+def main():
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for many families."
+    )
+    parser.add_argument("data",
+                        help="CSV file of many families, or directory of CSV files")
+    parser.add_argument("mode", nargs="?", default="exact",
+                        choices=list(MODES) + list(SAMPLERS))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--samples", type=int, default=None,
+                        help="sample budget for approximate modes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for approximate modes")
+    args = parser.parse_args()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow([
+        "source", "name", "gene_2", "gene_1", "gene_0", "trait_true", "trait_false"
+    ])
+
+    # Solve families in parallel, writing rows as each family finishes
+    jobs = family_jobs(args.data, args.mode, args.samples, args.seed)
+    with multiprocessing.Pool(args.workers) as pool:
+        for source, probabilities in pool.imap_unordered(solve, jobs, chunksize=16):
+            for person, p in probabilities.items():
+                writer.writerow([
+                    source, person,
+                    f"{p['gene'][2]:.4f}", f"{p['gene'][1]:.4f}", f"{p['gene'][0]:.4f}",
+                    f"{p['trait'][True]:.4f}", f"{p['trait'][False]:.4f}"
+                ])
+            sys.stdout.flush()
+
+
+def data_files(path):
+    """
+    Return the CSV files at `path`, which is either a file or a directory.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(path, filename)
+        for filename in os.listdir(path)
+        if filename.endswith(".csv")
+    )
+
+
+def family_jobs(path, mode, samples, seed):
+    """
+    Yield one job per independent family found in the data at `path`.
+    Each job is a tuple (source, people, mode, options).
+    """
+    count = 0
+    for filename in data_files(path):
+        people = load_data(filename)
+        for component in connected_components(people):
+            options = dict()
+            if mode in SAMPLERS:
+                if samples is not None:
+                    options["samples"] = samples
+                if seed is not None:
+                    options["seed"] = seed + count
+            family = {person: people[person] for person in component}
+            yield filename, family, mode, options
+            count += 1
+
+
+def solve(job):
+    """
+    Compute the probabilities for one family.
+    Return a tuple (source, probabilities).
+    """
+    source, people, mode, options = job
+    probabilities, _ = infer(people, mode, **options)
+    return source, probabilities
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import importlib.util
+import random
+import time
+import tracemalloc
+
+from heredity import (MODES, SAMPLERS, connected_components, exact_cost,
+                      enumeration_cost, infer)
+
+
+def main():
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Compare heredity inference modes on synthetic families."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 7, 9, 12, 20, 50],
+                        help="number of people in each generated family")
+    parser.add_argument("--depth", type=int, default=3,
+                        help="number of generations in each family")
+    parser.add_argument("--observed", type=float, default=0.5,
+                        help="fraction of people whose trait is known")
+    parser.add_argument("--modes", nargs="+", default=list(MODES) + list(SAMPLERS),
+                        choices=list(MODES) + list(SAMPLERS))
+    parser.add_argument("--samples", type=int, default=10000,
+                        help="sample budget for approximate modes")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for families and sampling")
+    parser.add_argument("--max-exact", type=int, default=10 ** 5,
+                        help="skip the exact mode above this many joint probabilities")
+    parser.add_argument("--max-vectorized", type=int, default=10 ** 7,
+                        help="skip the vectorized mode above this many joint probabilities")
+    args = parser.parse_args()
+    if min(args.sizes) < 1:
+        parser.error("family sizes must be at least 1")
+
+    limits = {"exact": args.max_exact, "vectorized": args.max_vectorized}
+    if "vectorized" in args.modes:
+        if importlib.util.find_spec("numpy") is None:
+            print("NumPy is not installed, skipping the vectorized mode")
+            args.modes.remove("vectorized")
+        else:
+            # Import up front so the first timing doesn't include it
+            importlib.import_module("numpy")
+
+    print(f"{'size':>5} {'mode':>11} {'seconds':>10} {'peak KiB':>10} {'max error':>10}")
+    for size in args.sizes:
+        people = generate_pedigree(size, args.depth, args.observed, seed=args.seed)
+
+        # Find the exact answer first, if it is affordable, to compare against
+        results = dict()
+        for mode in sorted(args.modes, key=lambda mode: mode not in MODES):
+            if mode in limits and cost(people, mode) > limits[mode]:
+                print(f"{size:>5} {mode:>11} {'skipped':>10}")
+                continue
+            results[mode], seconds, peak = measure(
+                people, mode, samples=args.samples, seed=args.seed
+            )
+            reference = results.get("exact", results.get("vectorized"))
+            error = (
+                f"{max_difference(results[mode], reference):.4f}"
+                if reference is not None else "n/a"
+            )
+            print(f"{size:>5} {mode:>11} {seconds:>10.4f} {peak / 1024:>10.1f} {error:>10}")
+
+
+def generate_pedigree(size, depth, observed, seed=None):
+    """
+    Generate a family of `size` people over `depth` generations, in the
+    format returned by `load_data`. Each person's trait is known with
+    probability `observed`. A family of one person is a single founder.
+    """
+    rng = random.Random(seed)
+    people = dict()
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": rng.random() < 0.5 if rng.random() < observed else None
+        }
+        return name
+
+    if size < 2:
+        for _ in range(size):
+            add()
+        return people
+
+    # Start with a couple, and spread the remaining people over generations
+    generation = [add(), add()]
+    remaining = size - 2
+    for level in range(1, depth):
+        children = []
+        per_generation = -(-remaining // (depth - level))
+        while len(children) < per_generation and len(people) < size:
+
+            # Pair two people from the previous generation, or one of them
+            # with a new founder if there is room
+            mother = rng.choice(generation)
+            others = [person for person in generation if person != mother]
+            if others and (rng.random() < 0.5 or len(people) + 2 > size):
+                father = rng.choice(others)
+            elif len(people) + 2 <= size:
+                father = add()
+            else:
+                break
+            children.append(add(mother, father))
+        remaining = size - len(people)
+        generation = children or generation
+
+    # Any people left over become unrelated founders
+    while len(people) < size:
+        add()
+    return people
+
+
+def cost(people, mode):
+    """
+    Return the number of joint probabilities `mode` computes for `people`.
+    """
+    estimate = exact_cost if mode == "exact" else enumeration_cost
+    return sum(
+        estimate({person: people[person] for person in component})
+        for component in connected_components(people)
+    )
+
+
+def measure(people, mode, samples, seed):
+    """
+    Run inference on `people` with `mode`.
+    Return a tuple of the probabilities, seconds taken and peak bytes allocated.
+    """
+    start = time.perf_counter()
+    probabilities, _ = infer(people, mode, samples=samples, seed=seed)
+    seconds = time.perf_counter() - start
+
+    # Tracing slows pure Python far more than NumPy, so memory is measured
+    # in a second, untimed run
+    tracemalloc.start()
+    infer(people, mode, samples=samples, seed=seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return probabilities, seconds, peak
+
+
+def max_difference(probabilities, reference):
+    """
+    Return the largest absolute difference between two sets of distributions.
+    """
+    return max(
+        abs(probabilities[person][field][value] - reference[person][field][value])
+        for person in reference
+        for field in reference[person]
+        for value in reference[person][field]
+    )
+
+
+if __name__ == "__main__":
+    main()
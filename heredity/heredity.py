@@ -1,6 +1,8 @@
+import argparse
 import csv
 import itertools
-import sys
+import math
+import random
 
 PROBS = {
 
@@ -36,16 +38,59 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Lookup tables derived from PROBS, see factor_tables
+FACTOR_TABLES = dict()
+
+# Maximum number of array cells scored at once by the vectorized mode
+VECTOR_BATCH_CELLS = 2 ** 22
+
+# Default sample budget for the approximate inference modes
+SAMPLES = 10000
+
+# Number of batches used to estimate the error of Gibbs sampling
+GIBBS_BATCHES = 20
+
 
 def main():
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for a family."
+    )
+    parser.add_argument("data", help="CSV file of people, parents and traits")
+    parser.add_argument("mode", nargs="?", default="exact",
+                        choices=list(MODES) + list(SAMPLERS))
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="sample budget for approximate modes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for approximate modes")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    # Calculate gene and trait probabilities for each person
+    probabilities, errors = infer(
+        people, args.mode, samples=args.samples, seed=args.seed
+    )
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+    # Report how precise an approximate answer is
+    if errors is not None:
+        print(f"Max standard error: {max_error(errors):.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a probability distribution for each person, with all values 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,6 +105,119 @@ def main():
         for person in people
     }
 
+
+def infer(people, mode, samples=SAMPLES, seed=None):
+    """
+    Compute each person's gene and trait distribution with the inference
+    mode named `mode`, solving unrelated families separately since they are
+    independent.
+
+    Return a tuple of the probabilities and, for approximate modes, their
+    standard errors (None otherwise).
+    """
+    probabilities = dict()
+    errors = dict() if mode in SAMPLERS else None
+    for component in connected_components(people):
+        family = {person: people[person] for person in component}
+        if mode in SAMPLERS:
+            family_probabilities, family_errors = SAMPLERS[mode](
+                family, samples=samples, seed=seed
+            )
+            errors.update(family_errors)
+        else:
+            family_probabilities = MODES[mode](family)
+        probabilities.update(family_probabilities)
+    return probabilities, errors
+
+
+def exact_probabilities(people):
+    """
+    Compute each person's gene and trait distribution by enumerating every
+    assignment of genes and traits consistent with the known information.
+
+    If fixing the genes of the people without parents splits everyone else
+    into separate groups, and doing so is cheaper, enumerate the founders'
+    genes and solve each group independently given them.
+    """
+    founders, groups = founder_groups(people)
+    if conditioning_helps(people, founders, groups):
+        probabilities = conditioned_probabilities(people, founders, groups)
+    else:
+        probabilities = enumerate_probabilities(people)
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
+
+
+def founder_groups(people):
+    """
+    Return a tuple (founders, groups): the names of people without parents,
+    and the rest of `people` split into groups connected only through
+    parents who are not founders.
+    """
+    founders = [person for person in people if people[person]["mother"] is None]
+    descendants = {
+        person: people[person] for person in people if person not in founders
+    }
+    groups = [
+        {person: people[person] for person in component}
+        for component in connected_components(descendants)
+    ]
+    return founders, groups
+
+
+def conditioning_helps(people, founders, groups):
+    """
+    Return True if enumerating `founders` and solving `groups` separately is
+    cheaper than enumerating all of `people` at once.
+    """
+    return len(groups) > 1 and conditioned_cost(founders, groups) < enumeration_cost(people)
+
+
+def conditioned_cost(founders, groups):
+    """
+    Return the number of joint probabilities `conditioned_probabilities`
+    computes.
+    """
+    return 3 ** len(founders) * sum(enumeration_cost(group) for group in groups)
+
+
+def exact_cost(people):
+    """
+    Return the number of joint probabilities `exact_probabilities` computes
+    for a single family.
+    """
+    founders, groups = founder_groups(people)
+    if conditioning_helps(people, founders, groups):
+        return conditioned_cost(founders, groups)
+    return enumeration_cost(people)
+
+
+def enumeration_cost(people):
+    """
+    Return the number of joint probabilities `enumerate_probabilities`
+    computes for `people`.
+    """
+    unknown = sum(1 for person in people if people[person]["trait"] is None)
+    return 3 ** len(people) * 2 ** unknown
+
+
+def enumerate_probabilities(people, fixed_one=frozenset(), fixed_two=frozenset()):
+    """
+    Return unnormalized gene and trait distributions for `people`, summing
+    joint probabilities over every assignment consistent with the evidence.
+
+    Parents who are not in `people` must have their genes fixed by
+    `fixed_one` and `fixed_two`.
+    """
+
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
+    # Fetch the factor table once, rather than once per assignment
+    factors = factor_tables()["person"]
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -78,20 +236,72 @@ def main():
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
+                p = joint_probability(
+                    people, one_gene | fixed_one, two_genes | fixed_two, have_trait,
+                    factors=factors
+                )
                 update(probabilities, one_gene, two_genes, have_trait, p)
 
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def conditioned_probabilities(people, founders, groups):
+    """
+    Return unnormalized gene and trait distributions for `people` by
+    enumerating the genes of `founders`. Given those, each of `groups` (the
+    remaining people, split into groups that share no parents other than
+    founders) is independent of the others and is enumerated on its own.
+    """
+    tables = factor_tables()
+    probabilities = empty_probabilities(people)
+
+    for founder_genes in itertools.product(range(3), repeat=len(founders)):
+        fixed_one = frozenset(
+            f for f, genes in zip(founders, founder_genes) if genes == 1
+        )
+        fixed_two = frozenset(
+            f for f, genes in zip(founders, founder_genes) if genes == 2
+        )
+
+        # Probability of the founders' genes and known traits
+        weight = 1
+        for founder, genes in zip(founders, founder_genes):
+            weight *= tables["gene"][genes]
+            if people[founder]["trait"] is not None:
+                weight *= tables["trait"][genes][people[founder]["trait"]]
+
+        # Solve each group, and find its total probability
+        results = [
+            enumerate_probabilities(group, fixed_one, fixed_two)
+            for group in groups
+        ]
+        totals = [
+            sum(result[next(iter(group))]["gene"].values())
+            for group, result in zip(groups, results)
+        ]
+
+        # Each group's distributions are weighted by the other groups' totals
+        for k, result in enumerate(results):
+            others = weight * math.prod(
+                total for j, total in enumerate(totals) if j != k
+            )
+            for person in result:
+                for field in result[person]:
+                    for value, p in result[person][field].items():
+                        probabilities[person][field][value] += others * p
+
+        # Founders' distributions are weighted by everyone's total
+        p = weight * math.prod(totals)
+        for founder, genes in zip(founders, founder_genes):
+            probabilities[founder]["gene"][genes] += p
+            trait = people[founder]["trait"]
+            if trait is None:
+                probabilities[founder]["trait"][True] += p * tables["trait"][genes][True]
+                probabilities[founder]["trait"][False] += p * tables["trait"][genes][False]
+            else:
+                probabilities[founder]["trait"][trait] += p
+
+    return probabilities
 
 
 def load_data(filename):
@@ -116,6 +326,42 @@ def load_data(filename):
     return data
 
 
+def connected_components(people):
+    """
+    Split people into independent families: lists of names connected to each
+    other through mother and father links, in the order they appear.
+    """
+
+    # Link each person to their parents and children, ignoring parents who
+    # are not among `people`
+    links = {person: set() for person in people}
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent in links:
+                links[person].add(parent)
+                links[parent].add(person)
+
+    # Collect everyone reachable from each person not yet in a component
+    position = {person: i for i, person in enumerate(people)}
+    components = []
+    seen = set()
+    for person in people:
+        if person in seen:
+            continue
+        seen.add(person)
+        frontier = [person]
+        members = set()
+        while frontier:
+            current = frontier.pop()
+            members.add(current)
+            for linked in links[current]:
+                if linked not in seen:
+                    seen.add(linked)
+                    frontier.append(linked)
+        components.append(sorted(members, key=position.get))
+    return components
+
+
 def powerset(s):
     """
     Return a list of all possible subsets of set s.
@@ -139,22 +385,24 @@ def trait_bool(person, have_trait):
     trait = True if person in have_trait else False
     return trait
 
-def transmit_prob(child_genes, m_genes, f_genes):
+def parent_transmit_probs():
 
     # Get generic probabilities
     p_no_mutation = (1 - PROBS["mutation"])
     p_mutation = PROBS["mutation"]
 
-    # Initiate var
-    p = 0
-
     # Generic probability of passing down 1 gene from parent
-    p_parent_transmit = {
+    return {
         0 : p_mutation,
         1 : (0.5 * p_no_mutation) + (0.5 * p_mutation),
         2 : p_no_mutation
     }
 
+def compute_transmit_prob(child_genes, m_genes, f_genes, p_parent_transmit):
+
+    # Initiate var
+    p = 0
+
     # If child genes are zero, its 1 - prob of passing down 1 gene (f) * (1 - prob of passing down a gene (m))
     if child_genes == 0:
         p = (1 - p_parent_transmit[m_genes]) * (1 - p_parent_transmit[f_genes])
@@ -171,53 +419,90 @@ def transmit_prob(child_genes, m_genes, f_genes):
 
     return p
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def probs_key():
+    """
+    Return a hashable snapshot of PROBS, used to tell when it has changed.
+    """
+    return (
+        tuple(PROBS["gene"][genes] for genes in range(3)),
+        tuple(PROBS["trait"][genes][trait]
+              for genes in range(3) for trait in (False, True)),
+        PROBS["mutation"]
+    )
+
+def factor_tables():
+    """
+    Return lookup tables derived from PROBS, rebuilding them only if PROBS
+    has changed since they were last built:
+
+    - "gene": gene[g], unconditional probability of g genes
+    - "trait": trait[g][t], probability of trait t (indexed by bool) given g genes
+    - "transmit": transmit[g][m][f], probability of g genes given parents'
+      gene counts m and f
+    - "person": person[g, m, f, t], one person's whole factor in the joint
+      probability; m and f are None for people without parents
+    """
+    key = probs_key()
+    if FACTOR_TABLES.get("key") == key:
+        return FACTOR_TABLES
+
+    gene = [PROBS["gene"][g] for g in range(3)]
+    trait = [[PROBS["trait"][g][False], PROBS["trait"][g][True]] for g in range(3)]
+    p_parent_transmit = parent_transmit_probs()
+    transmit = [
+        [[compute_transmit_prob(g, m, f, p_parent_transmit) for f in range(3)]
+         for m in range(3)]
+        for g in range(3)
+    ]
 
-    # Create a set of names, people with no genes and people with no trait
-    names = set()
-    no_genes = set()
-    no_trait = set()
-    for person in list(people.keys()):
-        names.add(person)
-        if person not in one_gene and person not in two_genes: no_genes.add(person)
-        if person not in have_trait: no_trait.add(person)
+    person = dict()
+    for g in range(3):
+        for t in (False, True):
+            person[g, None, None, t] = gene[g] * trait[g][t]
+            for m in range(3):
+                for f in range(3):
+                    person[g, m, f, t] = transmit[g][m][f] * trait[g][t]
 
-    # Probability for all people
-    joint_prob = 1
+    FACTOR_TABLES.clear()
+    FACTOR_TABLES.update(
+        key=key, gene=gene, trait=trait, transmit=transmit, person=person
+    )
+    return FACTOR_TABLES
 
-    # Loop over the people
-    for person in names:
+def transmit_prob(child_genes, m_genes, f_genes):
 
-        # Probability for this person
-        p = 1
+    # Look up the probability of the child's genes given the parents' genes
+    return factor_tables()["transmit"][child_genes][m_genes][f_genes]
 
-        # Put the genetic info for this person in variables
-        m = people[person]["mother"]
-        f = people[person]["father"]
-        parents = 0 if m == None and f == None else 1
-        genes = count_genes(person, one_gene, two_genes)
-        trait = trait_bool(person, have_trait)
+def joint_probability(people, one_gene, two_genes, have_trait, factors=None):
 
-        # Create generic probabilities
-        p_no_mutation = 1 - PROBS["mutation"]
+    # Look up each person's factor once their genes and trait are known.
+    # Callers in a loop pass the table in, to skip checking PROBS each time.
+    if factors is None:
+        factors = factor_tables()["person"]
 
-        # If no parents, use generic probability based on genes (we'll trait-weight later)
-        if parents == 0:
-            p *= PROBS["gene"][genes]
-        
-        else:        
-            # Call the transmission probabilities function
-            p *= transmit_prob(genes, count_genes(m, one_gene, two_genes), count_genes(f, one_gene, two_genes))
+    # Count everyone's genes once, rather than once per child for parents.
+    # Parents outside `people` are counted too, from the same gene sets.
+    genes = dict()
+    for person in people:
+        for relative in (person, people[person]["mother"], people[person]["father"]):
+            if relative is not None and relative not in genes:
+                genes[relative] = count_genes(relative, one_gene, two_genes)
 
-        # Calc trait-weighted probability
-        p *= PROBS["trait"][genes][trait]
+    # Probability for all people
+    joint_prob = 1
 
-        # Update the joint probability for this person
-        joint_prob = joint_prob * p
+    # Loop over the people
+    for person in people:
+        m = people[person]["mother"]
+        f = people[person]["father"]
+        joint_prob *= factors[
+            genes[person],
+            None if m is None else genes[m],
+            None if f is None else genes[f],
+            person in have_trait
+        ]
 
-    # Quit
-    # sys.exit()
-    
     return joint_prob
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -246,5 +531,318 @@ def normalize(probabilities):
         probabilities[person]["trait"][True] *= adj_trait
         probabilities[person]["trait"][False] *= adj_trait
 
+def vectorized_probabilities(people):
+    """
+    Compute the same distributions as `exact_probabilities`, but score whole
+    batches of assignments at once with NumPy.
+
+    Gene assignments are encoded as rows of an integer array (one column per
+    person, values 0-2) and trait assignments consistent with the evidence as
+    rows of a 0/1 array. Joint probabilities come from lookup tables indexed
+    by those arrays, and marginals are accumulated with `bincount`.
+    """
+    import numpy as np
+
+    names = list(people)
+    n = len(names)
+    index = {person: i for i, person in enumerate(names)}
+
+    # Lookup tables built from PROBS
+    tables = factor_tables()
+    gene_table = np.array(tables["gene"])
+    trait_table = np.array(tables["trait"])
+    transmit_table = np.array(tables["transmit"])
+
+    # Column indices of people without parents, and of children and their parents
+    founders = [index[p] for p in names if people[p]["mother"] is None]
+    children = [index[p] for p in names if people[p]["mother"] is not None]
+    mothers = [index[people[names[c]]["mother"]] for c in children]
+    fathers = [index[people[names[c]]["father"]] for c in children]
+
+    # Every trait assignment consistent with the evidence, one row each
+    unknown = [i for i, p in enumerate(names) if people[p]["trait"] is None]
+    traits = np.zeros((2 ** len(unknown), n), dtype=np.intp)
+    for i, person in enumerate(names):
+        if people[person]["trait"]:
+            traits[:, i] = 1
+    rows = np.arange(len(traits))
+    for bit, i in enumerate(unknown):
+        traits[:, i] = (rows >> bit) & 1
+
+    # Size gene batches so the (genes, traits, people) array stays bounded
+    batch_size = max(1, VECTOR_BATCH_CELLS // (len(traits) * max(n, 1)))
+    powers = 3 ** np.arange(n)
+
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros((n, 2))
+    for start in range(0, 3 ** n, batch_size):
+
+        # Decode a batch of gene assignments from base-3 integers
+        codes = np.arange(start, min(start + batch_size, 3 ** n))
+        genes = (codes[:, None] // powers) % 3
+
+        # Probability of each gene assignment
+        p_genes = (
+            gene_table[genes[:, founders]].prod(axis=1) *
+            transmit_table[
+                genes[:, children], genes[:, mothers], genes[:, fathers]
+            ].prod(axis=1)
+        )
+
+        # Joint probability of each (gene assignment, trait assignment) pair
+        p = p_genes[:, None] * trait_table[genes[:, None, :], traits[None, :, :]].prod(axis=2)
+
+        # Accumulate marginals for each person
+        p_by_genes = p.sum(axis=1)
+        p_by_traits = p.sum(axis=0)
+        for i in range(n):
+            gene_totals[i] += np.bincount(genes[:, i], weights=p_by_genes, minlength=3)
+            trait_totals[i] += np.bincount(traits[:, i], weights=p_by_traits, minlength=2)
+
+    # Convert back to the dictionary format used everywhere else
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        for genes in range(3):
+            probabilities[person]["gene"][genes] = float(gene_totals[i, genes])
+        probabilities[person]["trait"][True] = float(trait_totals[i, 1])
+        probabilities[person]["trait"][False] = float(trait_totals[i, 0])
+
+    normalize(probabilities)
+    return probabilities
+
+
+def topological_order(people):
+    """
+    Return a list of people in which everyone appears after their parents.
+    """
+    order = []
+    placed = set()
+    remaining = list(people)
+    while remaining:
+        waiting = []
+        for person in remaining:
+            parents = (people[person]["mother"], people[person]["father"])
+            if all(parent is None or parent in placed for parent in parents):
+                order.append(person)
+                placed.add(person)
+            else:
+                waiting.append(person)
+        if len(waiting) == len(remaining):
+            raise ValueError("family tree contains a cycle")
+        remaining = waiting
+    return order
+
+
+def sample_genes(distribution, rng):
+    """
+    Draw a gene count from a list of probabilities for 0, 1 and 2 genes.
+    """
+    r = rng.random() * sum(distribution)
+    for genes, p in enumerate(distribution):
+        r -= p
+        if r < 0:
+            return genes
+    return 2
+
+
+def gene_distribution(people, person, genes, tables=None):
+    """
+    Return the probabilities of `person` having 0, 1 and 2 genes, given the
+    gene counts of their parents in `genes`. Samplers pass in `tables`, so
+    PROBS isn't checked for every person in every sample.
+    """
+    if tables is None:
+        tables = factor_tables()
+    m = people[person]["mother"]
+    f = people[person]["father"]
+    if m is None and f is None:
+        return list(tables["gene"])
+    return [tables["transmit"][g][genes[m]][genes[f]] for g in range(3)]
+
+
+def add_sample(totals, people, genes, weight, trait_table=None):
+    """
+    Add a weighted gene assignment to running totals of the distributions.
+    Unobserved traits contribute their expected value given the genes rather
+    than a sampled value, which lowers the variance of the estimate.
+    """
+    if trait_table is None:
+        trait_table = factor_tables()["trait"]
+    for person, g in genes.items():
+        totals[person]["gene"][g] += weight
+        trait = people[person]["trait"]
+        if trait is None:
+            totals[person]["trait"][True] += weight * trait_table[g][True]
+            totals[person]["trait"][False] += weight * trait_table[g][False]
+        else:
+            totals[person]["trait"][trait] += weight
+
+
+def binomial_errors(probabilities, n):
+    """
+    Return the standard error of each probability, estimated from `n`
+    effective independent samples.
+    """
+    return {
+        person: {
+            field: {
+                value: math.sqrt(p * (1 - p) / n) if n > 0 else 1.0
+                for value, p in probabilities[person][field].items()
+            }
+            for field in probabilities[person]
+        }
+        for person in probabilities
+    }
+
+
+def max_error(errors):
+    """
+    Return the largest standard error over all people and values.
+    """
+    return max(
+        (e for person in errors for field in errors[person]
+         for e in errors[person][field].values()),
+        default=0
+    )
+
+
+def likelihood_weighting(people, samples=SAMPLES, seed=None):
+    """
+    Estimate each person's gene and trait distribution by likelihood
+    weighting: sample genes from parents to children, and weight each sample
+    by the probability of the observed traits.
+
+    Return a tuple of the probabilities and their standard errors.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+    totals = empty_probabilities(people)
+
+    # Fetch the tables once, rather than once per person per sample
+    tables = factor_tables()
+    trait_table = tables["trait"]
+
+    total_weight = 0
+    total_squared = 0
+    for _ in range(samples):
+
+        # Sample genes for everyone, weighting by the known traits
+        genes = dict()
+        weight = 1
+        for person in order:
+            genes[person] = sample_genes(
+                gene_distribution(people, person, genes, tables), rng
+            )
+            if people[person]["trait"] is not None:
+                weight *= trait_table[genes[person]][people[person]["trait"]]
+
+        add_sample(totals, people, genes, weight, trait_table)
+        total_weight += weight
+        total_squared += weight ** 2
+
+    if total_weight == 0:
+        raise ValueError("no sample is consistent with the evidence")
+    normalize(totals)
+
+    # Weighted samples are worth fewer independent ones
+    effective = total_weight ** 2 / total_squared
+    return totals, binomial_errors(totals, effective)
+
+
+def gibbs_sampling(people, samples=SAMPLES, seed=None, burn_in=None):
+    """
+    Estimate each person's gene and trait distribution by Gibbs sampling:
+    repeatedly resample each person's genes given everyone else's genes and
+    the observed traits. `samples` counts full sweeps over the family, after
+    `burn_in` sweeps that are discarded (a tenth of `samples` by default).
+
+    Return a tuple of the probabilities and their standard errors.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+
+    # Fetch the tables once, rather than once per person per sweep
+    tables = factor_tables()
+    if burn_in is None:
+        burn_in = samples // 10
+
+    # Everyone's children, to score how a person's genes explain them
+    children = {person: [] for person in people}
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                children[parent].append(person)
+
+    # Start from an assignment sampled from the prior
+    genes = dict()
+    for person in order:
+        genes[person] = sample_genes(gene_distribution(people, person, genes, tables), rng)
+
+    totals = empty_probabilities(people)
+    batches = []
+    batch_size = max(1, samples // GIBBS_BATCHES)
+    batch = empty_probabilities(people)
+    for sweep in range(burn_in + samples):
+
+        # Resample each person given their parents, children and trait
+        for person in order:
+            distribution = gene_distribution(people, person, genes, tables)
+            for g in range(3):
+                genes[person] = g
+                if people[person]["trait"] is not None:
+                    distribution[g] *= tables["trait"][g][people[person]["trait"]]
+                for child in children[person]:
+                    m = people[child]["mother"]
+                    f = people[child]["father"]
+                    distribution[g] *= tables["transmit"][genes[child]][genes[m]][genes[f]]
+            genes[person] = sample_genes(distribution, rng)
+
+        if sweep < burn_in:
+            continue
+        add_sample(totals, people, genes, 1, tables["trait"])
+        add_sample(batch, people, genes, 1, tables["trait"])
+
+        # Keep means of consecutive batches to estimate the error
+        if (sweep - burn_in + 1) % batch_size == 0:
+            normalize(batch)
+            batches.append(batch)
+            batch = empty_probabilities(people)
+
+    normalize(totals)
+    return totals, batch_errors(totals, batches)
+
+
+def batch_errors(probabilities, batches):
+    """
+    Return the standard error of each probability, estimated from the spread
+    of the means of consecutive batches of correlated samples.
+    """
+    n = len(batches)
+    errors = empty_probabilities(probabilities)
+    for person in probabilities:
+        for field in probabilities[person]:
+            for value, p in probabilities[person][field].items():
+                if n < 2:
+                    errors[person][field][value] = 1.0
+                    continue
+                variance = sum(
+                    (batch[person][field][value] - p) ** 2 for batch in batches
+                ) / (n - 1)
+                errors[person][field][value] = math.sqrt(variance / n)
+    return errors
+
+
+# Inference modes selectable from the command line
+MODES = {
+    "exact": exact_probabilities,
+    "vectorized": vectorized_probabilities
+}
+
+# Approximate inference modes, which also return standard errors
+SAMPLERS = {
+    "weighting": likelihood_weighting,
+    "gibbs": gibbs_sampling
+}
+
 if __name__ == "__main__":
     main()
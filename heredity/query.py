@@ -0,0 +1,250 @@
+import argparse
+import math
+
+from heredity import (connected_components, factor_tables, load_data,
+                      topological_order)
+
+
+def main():
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Answer a conditional query about one person in a family."
+    )
+    parser.add_argument("data", help="CSV file of people, parents and traits")
+    parser.add_argument("person", help="name of the person to ask about")
+    parser.add_argument("--genes", type=int, choices=[0, 1, 2],
+                        help="number of copies of the gene to ask about")
+    parser.add_argument("--trait", type=int, choices=[0, 1],
+                        help="whether the person has the trait")
+    parser.add_argument("--given", nargs="*", default=[], metavar="NAME=TRAIT",
+                        help="extra observed traits, e.g. Harry=1")
+    args = parser.parse_args()
+
+    given = dict()
+    for observation in args.given:
+        name, _, trait = observation.partition("=")
+        if trait not in ("0", "1"):
+            parser.error(f"invalid observation {observation}")
+        given[name] = trait == "1"
+
+    model = FamilyModel(load_data(args.data))
+    for name in [args.person, *given]:
+        if name not in model.families:
+            parser.error(f"unknown person {name}")
+    trait = None if args.trait is None else bool(args.trait)
+    p = model.probability(args.person, genes=args.genes, trait=trait, given=given)
+    print(f"{p:.4f}")
+
+
+def log(p):
+    """
+    Return the natural logarithm of `p`, or negative infinity if `p` is 0.
+    """
+    return math.log(p) if p > 0 else -math.inf
+
+
+def log_sum_exp(values):
+    """
+    Return log(sum(exp(v) for v in values)) without overflow or underflow.
+    """
+    values = list(values)
+    if not values:
+        return -math.inf
+    largest = max(values)
+    if largest == -math.inf:
+        return -math.inf
+    return largest + math.log(sum(math.exp(v - largest) for v in values))
+
+
+class Family():
+    """
+    One connected family, compiled into the log probability of every
+    assignment of genes given the evidence so far.
+    """
+
+    def __init__(self, people, names, tables):
+        self.names = names
+        self.index = {person: i for i, person in enumerate(names)}
+
+        # Log factors looked up for each person
+        log_gene = [log(p) for p in tables["gene"]]
+        log_transmit = [
+            [[log(p) for p in row] for row in table] for table in tables["transmit"]
+        ]
+        self.log_trait = [[log(p) for p in row] for row in tables["trait"]]
+
+        # genes[i][k] is person i's gene count in assignment k, where
+        # assignments are numbered as base-3 integers
+        count = 3 ** len(names)
+        self.genes = [
+            bytes((k // 3 ** i) % 3 for k in range(count))
+            for i in range(len(names))
+        ]
+
+        # Log probability of each assignment before any trait is observed
+        self.weights = [0.0] * count
+        for person in topological_order({p: people[p] for p in names}):
+            column = self.genes[self.index[person]]
+            m = people[person]["mother"]
+            f = people[person]["father"]
+            if m is None and f is None:
+                self.weights = [w + log_gene[g] for w, g in zip(self.weights, column)]
+            else:
+                m_column = self.genes[self.index[m]]
+                f_column = self.genes[self.index[f]]
+                self.weights = [
+                    w + log_transmit[g][gm][gf]
+                    for w, g, gm, gf in zip(self.weights, column, m_column, f_column)
+                ]
+
+        self.evidence = dict()
+        self.marginals = None
+
+    def observe(self, person, trait):
+        """
+        Set the observed trait of `person` (None if unknown), updating the log
+        probability of each assignment by the change in its trait factor.
+        """
+        old = self.evidence.get(person)
+        if old == trait:
+            return
+        delta = [
+            (0 if trait is None else self.log_trait[g][trait]) -
+            (0 if old is None else self.log_trait[g][old])
+            for g in range(3)
+        ]
+        column = self.genes[self.index[person]]
+        self.weights = [w + delta[g] for w, g in zip(self.weights, column)]
+        if trait is None:
+            del self.evidence[person]
+        else:
+            self.evidence[person] = trait
+        self.marginals = None
+
+    def log_gene_marginals(self, person, given=None):
+        """
+        Return the log probabilities of `person` having 0, 1 and 2 genes given
+        the evidence. Extra observations in `given` apply only to this call;
+        without them, everyone's marginals are computed together and cached
+        until the evidence changes.
+        """
+        if not given:
+            if self.marginals is None:
+                self.marginals = self.compute_marginals(self.weights, self.names)
+            return self.marginals[person]
+
+        weights = self.weights
+        for other, trait in given.items():
+            old = self.evidence.get(other)
+            delta = [
+                self.log_trait[g][trait] - (0 if old is None else self.log_trait[g][old])
+                for g in range(3)
+            ]
+            column = self.genes[self.index[other]]
+            weights = [w + delta[g] for w, g in zip(weights, column)]
+        return self.compute_marginals(weights, [person])[person]
+
+    def compute_marginals(self, weights, names):
+        """
+        Return the log gene marginals of each person in `names`, given log
+        probabilities `weights` of every assignment.
+        """
+        total = log_sum_exp(weights)
+        marginals = dict()
+        for person in names:
+            by_genes = [[], [], []]
+            for w, g in zip(weights, self.genes[self.index[person]]):
+                by_genes[g].append(w)
+            marginals[person] = [log_sum_exp(values) - total for values in by_genes]
+        return marginals
+
+
+class FamilyModel():
+    """
+    Answer repeated queries about a set of families. Each family is compiled
+    once, and observing a trait updates the compiled log probabilities in
+    place rather than recomputing them.
+    """
+
+    def __init__(self, people):
+        self.people = people
+        tables = factor_tables()
+        self.trait_table = tables["trait"]
+        self.families = dict()
+        for component in connected_components(people):
+            family = Family(people, component, tables)
+            for person in component:
+                self.families[person] = family
+        for person in people:
+            if people[person]["trait"] is not None:
+                self.observe(person, people[person]["trait"])
+
+    def observe(self, person, trait):
+        """
+        Record that `person` has (True) or lacks (False) the trait, or that
+        it is unknown (None).
+        """
+        self.family(person).observe(person, trait)
+
+    def forget(self, person):
+        """
+        Remove any observation of `person`'s trait.
+        """
+        self.observe(person, None)
+
+    def probability(self, person, genes=None, trait=None, given=None):
+        """
+        Return the probability that `person` has `genes` copies of the gene
+        and has (True) or lacks (False) the trait, given the evidence and any
+        extra observed traits in `given`. Leave `genes` or `trait` as None to
+        ask about the other one alone.
+        """
+        family = self.family(person)
+        given = {
+            other: observed for other, observed in (given or dict()).items()
+            if self.family(other) is family
+        }
+        log_genes = family.log_gene_marginals(person, given)
+        observed = given.get(person, family.evidence.get(person))
+
+        p = 0
+        for g in range(3) if genes is None else [genes]:
+            if trait is None:
+                p_trait = 1
+            elif observed is None:
+                p_trait = self.trait_table[g][trait]
+            else:
+                p_trait = 1 if observed == trait else 0
+            p += math.exp(log_genes[g]) * p_trait
+        return p
+
+    def family(self, person):
+        """
+        Return the family of `person`, raising ValueError if there is no
+        such person.
+        """
+        if person not in self.families:
+            raise ValueError(f"unknown person {person}")
+        return self.families[person]
+
+    def probabilities(self):
+        """
+        Return every person's gene and trait distribution, in the same format
+        as `heredity.exact_probabilities`.
+        """
+        return {
+            person: {
+                "gene": {
+                    g: self.probability(person, genes=g) for g in (2, 1, 0)
+                },
+                "trait": {
+                    t: self.probability(person, trait=t) for t in (True, False)
+                }
+            }
+            for person in self.people
+        }
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,56 @@
 import itertools
+import multiprocessing
+import weakref
+
+from sat import Solver
+
+# Chunks of models given to each worker process by model_check
+MODEL_CHUNKS_PER_WORKER = 8
+
+# Longest expression that a compiled sentence computes inline, rather than
+# in a local variable of its own; see Program
+INLINE_LENGTH = 200
+
+# Counterexample test compiled in each worker process, see init_model_worker
+COUNTEREXAMPLE = None
 
 
 class Sentence():
 
+    # Sentences are interned: constructing a sentence equal to one that
+    # already exists returns the existing one, so identical subsentences
+    # share a node, with its hash and symbols computed once. Conjunctions
+    # are the exception, since `add` changes them; each operand is frozen
+    # instead (see `freeze`), so that nodes never change once shared
+    __slots__ = ("hash_value", "symbol_set", "__weakref__")
+    interned = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def intern(cls, key):
+        """
+        Returns a tuple (sentence, new): the existing sentence of class
+        `cls` with operands `key`, or else a new, uninitialized one that
+        later calls with the same operands will return.
+        """
+        sentence = Sentence.interned.get((cls, key))
+        if sentence is not None:
+            return sentence, False
+        sentence = object.__new__(cls)
+        Sentence.interned[cls, key] = sentence
+        return sentence, True
+
+    def __getstate__(self):
+        # Pickles hold only the operands (see __getnewargs__), since the
+        # cached hash differs between processes
+        return None
+
+    def freeze(self):
+        """
+        Returns an equal sentence that can't change, for use as an operand
+        of another sentence.
+        """
+        return self
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
@@ -11,9 +59,27 @@ class Sentence():
         """Returns string formula representing logical sentence."""
         return ""
 
+    def expression(self, program):
+        """
+        Returns a Python expression that is true when the sentence is true
+        in model `m`, given the terms `program` computes for its operands.
+        """
+        raise Exception("nothing to compile")
+
+    def tseitin(self, cnf):
+        """
+        Adds clauses to `cnf` defining a new literal equivalent to the
+        sentence, and returns that literal.
+        """
+        raise Exception("nothing to encode")
+
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return frozenset()
+
+    def operands(self):
+        """Returns the sentences that the sentence is built from."""
+        return ()
 
     @classmethod
     def validate(cls, sentence):
@@ -44,14 +110,24 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ("name",)
+
+    def __new__(cls, name):
+        sentence, new = Sentence.intern(cls, name)
+        if new:
+            sentence.name = name
+            sentence.hash_value = hash(("symbol", name))
+            sentence.symbol_set = frozenset([name])
+        return sentence
+
+    def __getnewargs__(self):
+        return (self.name,)
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (isinstance(other, Symbol) and self.name == other.name)
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self.hash_value
 
     def __repr__(self):
         return self.name
@@ -65,20 +141,41 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
+    def tseitin(self, cnf):
+        return cnf.variable(self.name)
+
+    def expression(self, program):
+        try:
+            return f"m & {1 << program.index[self.name]}"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
     def symbols(self):
-        return {self.name}
+        return self.symbol_set
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        operand = operand.freeze()
+        sentence, new = Sentence.intern(cls, operand)
+        if new:
+            sentence.operand = operand
+            sentence.hash_value = hash(("not", hash(operand)))
+            sentence.symbol_set = operand.symbols()
+        return sentence
+
+    def __getnewargs__(self):
+        return (self.operand,)
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (isinstance(other, Not) and self.operand == other.operand)
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -89,23 +186,52 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
+    def expression(self, program):
+        return f"not {program.term(self.operand)}"
+
+    def tseitin(self, cnf):
+        return -cnf.literal(self.operand)
+
     def symbols(self):
-        return self.operand.symbols()
+        return self.symbol_set
+
+    def operands(self):
+        return (self.operand,)
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+
+    __slots__ = ("conjuncts", "frozen")
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+
+        # Each conjunction gets a node of its own, which `add` can change
+        # until the conjunction is frozen
+        sentence = object.__new__(cls)
+        sentence.conjuncts = [conjunct.freeze() for conjunct in conjuncts]
+        sentence.frozen = False
+        sentence.hash_value = None
+        sentence.symbol_set = frozenset().union(
+            *[conjunct.symbols() for conjunct in conjuncts]
+        )
+        return sentence
+
+    def __getnewargs__(self):
+        return tuple(self.conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (isinstance(other, And) and self.conjuncts == other.conjuncts)
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+
+        # Computed on first use, since `add` changes it
+        if self.hash_value is None:
+            self.hash_value = hash(
+                ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+            )
+        return self.hash_value
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -113,9 +239,29 @@ class And(Sentence):
         )
         return f"And({conjunctions})"
 
+    def freeze(self):
+        if self.frozen:
+            return self
+        sentence, new = Sentence.intern(And, tuple(self.conjuncts))
+        if new:
+            sentence.conjuncts = list(self.conjuncts)
+            sentence.frozen = True
+            sentence.hash_value = hash(self)
+            sentence.symbol_set = self.symbol_set
+        return sentence
+
     def add(self, conjunct):
+        """
+        Adds a conjunct. Sentences built from this conjunction earlier hold
+        a frozen copy of it, so they don't change.
+        """
         Sentence.validate(conjunct)
+        if self.frozen:
+            raise TypeError("can't add to a conjunction inside another sentence")
+        conjunct = conjunct.freeze()
         self.conjuncts.append(conjunct)
+        self.symbol_set = self.symbol_set | conjunct.symbols()
+        self.hash_value = None
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
@@ -126,23 +272,53 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
+    def expression(self, program):
+        if not self.conjuncts:
+            return "True"
+        return " and ".join(program.term(conjunct) for conjunct in self.conjuncts)
+
+    def tseitin(self, cnf):
+        literals = [cnf.literal(conjunct) for conjunct in self.conjuncts]
+        x = cnf.variable()
+        for literal in literals:
+            cnf.clauses.append([-x, literal])
+        cnf.clauses.append([x] + [-literal for literal in literals])
+        return x
+
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        return self.symbol_set
+
+    def operands(self):
+        return tuple(self.conjuncts)
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        disjuncts = tuple(disjunct.freeze() for disjunct in disjuncts)
+        sentence, new = Sentence.intern(cls, disjuncts)
+        if new:
+            sentence.disjuncts = list(disjuncts)
+            sentence.hash_value = hash(
+                ("or", tuple(hash(disjunct) for disjunct in disjuncts))
+            )
+            sentence.symbol_set = frozenset().union(
+                *[disjunct.symbols() for disjunct in disjuncts]
+            )
+        return sentence
+
+    def __getnewargs__(self):
+        return tuple(self.disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (isinstance(other, Or) and self.disjuncts == other.disjuncts)
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return self.hash_value
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -157,24 +333,55 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
+    def expression(self, program):
+        if not self.disjuncts:
+            return "False"
+        return " or ".join(program.term(disjunct) for disjunct in self.disjuncts)
+
+    def tseitin(self, cnf):
+        literals = [cnf.literal(disjunct) for disjunct in self.disjuncts]
+        x = cnf.variable()
+        for literal in literals:
+            cnf.clauses.append([x, -literal])
+        cnf.clauses.append([-x] + literals)
+        return x
+
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return self.symbol_set
+
+    def operands(self):
+        return tuple(self.disjuncts)
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        antecedent = antecedent.freeze()
+        consequent = consequent.freeze()
+        sentence, new = Sentence.intern(cls, (antecedent, consequent))
+        if new:
+            sentence.antecedent = antecedent
+            sentence.consequent = consequent
+            sentence.hash_value = hash(
+                ("implies", hash(antecedent), hash(consequent))
+            )
+            sentence.symbol_set = antecedent.symbols() | consequent.symbols()
+        return sentence
+
+    def __getnewargs__(self):
+        return (self.antecedent, self.consequent)
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (isinstance(other, Implication)
+                                 and self.antecedent == other.antecedent
+                                 and self.consequent == other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -188,24 +395,54 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
+    def expression(self, program):
+        antecedent = program.term(self.antecedent)
+        consequent = program.term(self.consequent)
+        return f"not {antecedent} or {consequent}"
+
+    def tseitin(self, cnf):
+        antecedent = cnf.literal(self.antecedent)
+        consequent = cnf.literal(self.consequent)
+        x = cnf.variable()
+        cnf.clauses.append([-x, -antecedent, consequent])
+        cnf.clauses.append([x, antecedent])
+        cnf.clauses.append([x, -consequent])
+        return x
+
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        return self.symbol_set
+
+    def operands(self):
+        return (self.antecedent, self.consequent)
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        left = left.freeze()
+        right = right.freeze()
+        sentence, new = Sentence.intern(cls, (left, right))
+        if new:
+            sentence.left = left
+            sentence.right = right
+            sentence.hash_value = hash(("biconditional", hash(left), hash(right)))
+            sentence.symbol_set = left.symbols() | right.symbols()
+        return sentence
+
+    def __getnewargs__(self):
+        return (self.left, self.right)
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (isinstance(other, Biconditional)
+                                 and self.left == other.left
+                                 and self.right == other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -221,43 +458,467 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def expression(self, program):
+        left = program.term(self.left)
+        right = program.term(self.right)
+        return f"(not {left}) == (not {right})"
+
+    def tseitin(self, cnf):
+        left = cnf.literal(self.left)
+        right = cnf.literal(self.right)
+        x = cnf.variable()
+        cnf.clauses.append([-x, -left, right])
+        cnf.clauses.append([-x, left, -right])
+        cnf.clauses.append([x, left, right])
+        cnf.clauses.append([x, -left, -right])
+        return x
 
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+    def symbols(self):
+        return self.symbol_set
+
+    def operands(self):
+        return (self.left, self.right)
+
+
+def is_true(sentence):
+    """Checks if a sentence is the constant true, an empty conjunction."""
+    return isinstance(sentence, And) and not sentence.conjuncts
+
+
+def is_false(sentence):
+    """Checks if a sentence is the constant false, an empty disjunction."""
+    return isinstance(sentence, Or) and not sentence.disjuncts
+
+
+def is_literal(sentence):
+    """Checks if a sentence is a symbol or a negated symbol."""
+    return isinstance(sentence, Symbol) or (
+        isinstance(sentence, Not) and isinstance(sentence.operand, Symbol)
+    )
+
+
+def negate(sentence):
+    """Returns the negation of a simplified sentence, itself simplified."""
+    if is_true(sentence):
+        return Or()
+    if is_false(sentence):
+        return And()
+    if isinstance(sentence, Not):
+        return sentence.operand
+    return Not(sentence)
+
+
+def simplify(sentence, facts=None):
+    """
+    Returns a sentence equivalent to `sentence`, given that each symbol
+    named in `facts` has the value it maps to, with redundant structure
+    removed: nested conjunctions and disjunctions are flattened, repeated
+    operands dropped, and tautologies and contradictions replaced by the
+    constants And() (true) and Or() (false). Within a conjunction, symbols
+    that the conjunction asserts or denies are substituted into its other
+    operands, keeping the assertions themselves.
+    """
+    facts = facts or dict()
+
+    if isinstance(sentence, Symbol):
+        if sentence.name in facts:
+            return And() if facts[sentence.name] else Or()
+        return sentence
+
+    if isinstance(sentence, Not):
+        return negate(simplify(sentence.operand, facts))
+
+    if isinstance(sentence, And):
+        return simplify_conjunction(sentence.conjuncts, facts)
+
+    if isinstance(sentence, Or):
+        disjuncts = []
+        for disjunct in sentence.disjuncts:
+            disjunct = simplify(disjunct, facts)
+            if isinstance(disjunct, Or):
+                disjuncts.extend(disjunct.disjuncts)
+            elif is_true(disjunct):
+                return And()
+            else:
+                disjuncts.append(disjunct)
+        disjuncts = list(dict.fromkeys(disjuncts))
+        present = set(disjuncts)
+        if any(negate(disjunct) in present for disjunct in disjuncts):
+            return And()
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    if isinstance(sentence, Implication):
+        antecedent = simplify(sentence.antecedent, facts)
+
+        # The consequent only matters when a literal antecedent is true
+        if is_literal(antecedent):
+            consequent = simplify(sentence.consequent, {
+                **facts, **literal_fact(antecedent)
+            })
+        else:
+            consequent = simplify(sentence.consequent, facts)
+
+        if is_false(antecedent) or is_true(consequent) or antecedent == consequent:
+            return And()
+        if is_true(antecedent):
+            return consequent
+        if is_false(consequent):
+            return negate(antecedent)
+        return Implication(antecedent, consequent)
+
+    if isinstance(sentence, Biconditional):
+        left = simplify(sentence.left, facts)
+        right = simplify(sentence.right, facts)
+        if left == right:
+            return And()
+        if left == negate(right):
+            return Or()
+        for constant, other in ((left, right), (right, left)):
+            if is_true(constant):
+                return other
+            if is_false(constant):
+                return negate(other)
+        return Biconditional(left, right)
+
+    return sentence
+
+
+def literal_fact(literal):
+    """Returns the fact asserted by a literal, as a dict from name to value."""
+    if isinstance(literal, Symbol):
+        return {literal.name: True}
+    return {literal.operand.name: False}
+
+
+def simplify_conjunction(conjuncts, facts):
+    """
+    Simplifies the conjunction of `conjuncts` for `simplify`, propagating
+    the literals among them into the others until no new ones appear.
+    """
+    facts = dict(facts)
+    literals = []
+    rest = list(conjuncts)
+    while True:
+
+        # Simplify the remaining conjuncts with everything known so far
+        flattened = []
+        for conjunct in rest:
+            conjunct = simplify(conjunct, facts)
+            if isinstance(conjunct, And):
+                flattened.extend(conjunct.conjuncts)
+            elif is_false(conjunct):
+                return Or()
+            else:
+                flattened.append(conjunct)
+
+        # Any literal left is new, since known symbols were substituted
+        rest = []
+        for conjunct in flattened:
+            if not is_literal(conjunct):
+                rest.append(conjunct)
+                continue
+            ((name, value),) = literal_fact(conjunct).items()
+            if facts.get(name, value) != value:
+                return Or()
+            if name not in facts:
+                facts[name] = value
+                literals.append(conjunct)
+        if len(rest) == len(flattened):
+            break
+
+    conjuncts = list(dict.fromkeys(literals + rest))
+    present = set(conjuncts)
+    if any(negate(conjunct) in present for conjunct in conjuncts):
+        return Or()
+    return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+
+def postorder(sentence, done):
+    """
+    Yields the subsentences of `sentence` that aren't in `done`, each after
+    its operands, for the caller to add to `done`. The walk keeps its own
+    stack, so it isn't limited by Python's recursion limit however deeply
+    the sentence nests.
+    """
+    stack = [sentence]
+    while stack:
+        current = stack[-1]
+        if current in done:
+            stack.pop()
+            continue
+        pending = [operand for operand in current.operands() if operand not in done]
+        if pending:
+            stack.extend(reversed(pending))
+        else:
+            stack.pop()
+            yield current
+
+
+class CNF():
+    """
+    Clauses in conjunctive normal form, built from sentences by Tseitin
+    encoding: each subsentence gets a variable defined to be equivalent to
+    it, so the clauses grow linearly with the sentences.
+
+    Variables are positive integers; a literal is a variable, or its
+    negation for a negated variable. Each clause is a list of literals.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.clauses = []
+
+        # Variable of each symbol name, and literal of each encoded sentence
+        self.symbols = dict()
+        self.literals = dict()
+
+    def variable(self, name=None):
+        """
+        Returns the variable of the symbol called `name`, or a new variable
+        if `name` is None.
+        """
+        if name is not None and name in self.symbols:
+            return self.symbols[name]
+        self.count += 1
+        if name is not None:
+            self.symbols[name] = self.count
+        return self.count
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to `sentence`, encoding it once.
+        """
+
+        # Encode operands first, so tseitin finds their literals ready
+        for subsentence in postorder(sentence, self.literals):
+            self.literals[subsentence] = subsentence.tseitin(self)
+        return self.literals[sentence]
+
+    def add(self, sentence):
+        """
+        Adds clauses that are satisfied exactly when `sentence` is true.
+        Conjunctions and disjunctions at the top level are added as clauses
+        directly, without a variable of their own.
+        """
+        pending = [sentence]
+        while pending:
+            sentence = pending.pop()
+            if isinstance(sentence, And):
+                pending.extend(reversed(sentence.conjuncts))
+            elif isinstance(sentence, Or):
+                self.clauses.append([self.literal(disjunct) for disjunct in sentence.disjuncts])
+            else:
+                self.clauses.append([self.literal(sentence)])
+
+
+class Program():
+    """
+    The body of a Python function of a model `m`, an integer with bit
+    `index[name]` set for each true symbol, computing sentences in that
+    model. Short subsentences are computed inline, so `and` and `or` can
+    skip them; longer ones are computed once into a local variable, so the
+    code stays flat however deeply the sentences nest or share parts.
+    """
+
+    def __init__(self, symbols):
+        self.index = {symbol: i for i, symbol in enumerate(symbols)}
+        self.lines = []
+
+        # Term holding the value of each computed sentence
+        self.terms = dict()
+
+    def term(self, sentence):
+        """
+        Returns a term whose truth is that of `sentence`, adding any lines
+        needed to compute it unless they have been added already.
+        """
+        for subsentence in postorder(sentence, self.terms):
+            expression = subsentence.expression(self)
+            if len(expression) <= INLINE_LENGTH:
+                self.terms[subsentence] = f"({expression})"
+            else:
+                name = f"t{len(self.lines)}"
+                self.lines.append(f"{name} = {expression}")
+                self.terms[subsentence] = name
+        return self.terms[sentence]
+
+    def function(self, expression):
+        """
+        Returns a function of a model that runs the lines added so far and
+        returns whether `expression`, which may use their terms, is true.
+        """
+        body = "".join(f"    {line}\n" for line in self.lines)
+        namespace = dict()
+        exec(f"def function(m):\n{body}    return bool({expression})\n", namespace)
+        return namespace["function"]
+
+
+class KnowledgeBase():
+    """
+    A knowledge base that sentences can be added to over time, answering
+    queries about what it entails without starting over each time.
+
+    By default it keeps the models in which it is true, extending and
+    filtering them as sentences are added, so a query only checks those
+    models. With `method="sat"`, it keeps a SAT solver instead, whose
+    learned clauses carry over from one query to the next.
+    """
+
+    def __init__(self, *sentences, method="models"):
+        if method not in ("models", "sat"):
+            raise ValueError(f"unknown method {method}")
+        self.method = method
+        self.knowledge = And()
+
+        # Symbols numbered in the order they were added, and the models
+        # (see compile_sentence) in which the knowledge base is true
+        self.symbols = []
+        self.index = dict()
+        self.models = [0]
+
+        # Clauses of the knowledge base, and how many the solver has
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.clauses_added = 0
+
+        # Results of earlier queries
+        self.results = dict()
+
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        sentence = simplify(sentence)
+        self.knowledge.add(sentence)
+
+        # Adding knowledge never stops a query from being entailed
+        self.results = {query: True for query, entailed in self.results.items() if entailed}
+
+        if self.method == "sat":
+            self.cnf.add(sentence)
+            self.update_solver()
+        else:
+            self.filter_models(sentence)
+
+    def filter_models(self, sentence):
+        """
+        Keeps only the models in which `sentence` is true, first extending
+        them with every value of any new symbols. Conjunctions are filtered
+        one conjunct at a time, so the models never grow much beyond the
+        final number.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.filter_models(conjunct)
+            return
+        for name in sorted(sentence.symbols() - self.index.keys()):
+            bit = 1 << len(self.symbols)
+            self.index[name] = len(self.symbols)
+            self.symbols.append(name)
+            self.models += [model | bit for model in self.models]
+        true = compile_sentence(sentence, self.symbols)
+        self.models = list(filter(true, self.models))
+
+    def update_solver(self):
+        """Gives the solver any clauses it doesn't have yet."""
+        for clause in self.cnf.clauses[self.clauses_added:]:
+            self.solver.add_clause(clause)
+        self.clauses_added = len(self.cnf.clauses)
+
+    def entails(self, query):
+        """Checks if the knowledge base entails `query`."""
+        if query in self.results:
+            return self.results[query]
+
+        if self.method == "sat":
+            negated = -self.cnf.literal(query)
+            self.update_solver()
+            entailed = not self.solver.solve([negated])
         else:
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+            # The query must hold in every model, whatever the values of
+            # symbols the knowledge base doesn't mention
+            symbols = self.symbols + sorted(query.symbols() - self.index.keys())
+            models = self.models
+            for k in range(len(self.symbols), len(symbols)):
+                models = models + [model | (1 << k) for model in models]
+            entailed = all(map(compile_sentence(query, symbols), models))
+
+        self.results[query] = entailed
+        return entailed
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, by checking with a SAT solver
+    that knowledge and not query can't both be true.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    negated = -cnf.literal(query)
+    return not Solver(cnf.clauses).solve([negated])
+
+
+def compile_sentence(sentence, symbols):
+    """
+    Compiles a sentence into a function of a model, given as an integer
+    whose bit i is set if `symbols[i]` is true. The function returns
+    whether the sentence is true in that model.
+    """
+    program = Program(symbols)
+    return program.function(program.term(sentence))
+
+
+def model_check(knowledge, query, workers=None):
+    """
+    Checks if knowledge base entails query. If `workers` is given, the
+    models are split between that many processes.
+    """
+
+    # Remove redundant structure, so each model is quicker to evaluate
+    knowledge = simplify(knowledge)
+    query = simplify(query)
+
+    # Get all symbols in both knowledge and query, numbered so that a
+    # model is an integer with one bit per symbol
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    count = 1 << len(symbols)
+
+    if not workers or workers == 1:
+        counterexample = compile_counterexample(knowledge, query, symbols)
+        return not any(map(counterexample, range(count)))
+
+    # Split the models into more chunks than workers, so that the search
+    # can stop soon after any worker finds a counterexample
+    size = max(1, -(-count // (workers * MODEL_CHUNKS_PER_WORKER)))
+    chunks = [(start, min(start + size, count)) for start in range(0, count, size)]
+    with multiprocessing.Pool(workers, initializer=init_model_worker,
+                              initargs=(knowledge, query, symbols)) as pool:
+        for entailed in pool.imap_unordered(check_models, chunks):
+            if not entailed:
+                return False
+    return True
+
+
+def compile_counterexample(knowledge, query, symbols):
+    """
+    Compiles a function of a model that returns True if the knowledge base
+    is true and the query false in that model.
+    """
+    program = Program(symbols)
+    knowledge = program.term(knowledge)
+    query = program.term(query)
+    return program.function(f"{knowledge} and not {query}")
+
+
+def init_model_worker(knowledge, query, symbols):
+    """Compiles the counterexample test once in each worker process."""
+    global COUNTEREXAMPLE
+    COUNTEREXAMPLE = compile_counterexample(knowledge, query, symbols)
+
+
+def check_models(chunk):
+    """Checks that no model in the range `chunk` is a counterexample."""
+    start, stop = chunk
+    return not any(map(COUNTEREXAMPLE, range(start, stop)))
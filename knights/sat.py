@@ -0,0 +1,289 @@
+import heapq
+
+# Factor by which variable activities effectively decay after each conflict
+ACTIVITY_DECAY = 0.95
+
+# Conflicts before the first restart, and growth of that limit per restart
+RESTART_CONFLICTS = 100
+RESTART_GROWTH = 1.5
+
+
+class Solver():
+    """
+    A DPLL SAT solver with clause learning (CDCL).
+
+    Variables are positive integers, and a literal is a variable or its
+    negation. Clauses are lists of literals. Learned clauses are kept
+    between calls to `solve`, so the same solver can answer many queries
+    given as assumptions.
+    """
+
+    def __init__(self, clauses=()):
+        """Create a solver for the conjunction of `clauses`."""
+        self.variables = set()
+
+        # Clauses watching each literal; each clause watches its first two
+        self.watches = dict()
+
+        # True literals, decision level and reason clause of each assigned
+        # variable, and the true literals in the order they were assigned
+        self.true = set()
+        self.levels = dict()
+        self.reasons = dict()
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+
+        # Activity of each variable for choosing decisions, and the value
+        # it last had
+        self.activity = dict()
+        self.increment = 1.0
+        self.heap = []
+        self.phase = dict()
+
+        # False once the clauses are known to be unsatisfiable
+        self.ok = True
+        self.model = None
+
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def value(self, literal):
+        """Return True or False if `literal` is assigned, or None if not."""
+        if literal in self.true:
+            return True
+        if -literal in self.true:
+            return False
+        return None
+
+    def register(self, variable):
+        """Add `variable` to the solver if it is new."""
+        if variable not in self.variables:
+            self.variables.add(variable)
+            self.activity[variable] = 0.0
+            heapq.heappush(self.heap, (0.0, variable))
+
+    def add_clause(self, clause):
+        """
+        Add a clause. Return False if the clauses are now known to be
+        unsatisfiable; return True otherwise.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        literals = list(dict.fromkeys(clause))
+        for literal in literals:
+            self.register(abs(literal))
+
+        # Skip tautologies and clauses already satisfied, and drop literals
+        # that are already false
+        if any(-literal in literals for literal in literals):
+            return True
+        if any(literal in self.true for literal in literals):
+            return True
+        literals = [literal for literal in literals if -literal not in self.true]
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.enqueue(literals[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(literals)
+        return self.ok
+
+    def attach(self, clause):
+        """Watch the first two literals of `clause`."""
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def enqueue(self, literal, reason):
+        """Make `literal` true, because of clause `reason` or as a decision."""
+        variable = abs(literal)
+        self.true.add(literal)
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assign every literal implied by unit propagation.
+        Return a conflicting clause, or None if there is no conflict.
+        """
+        true = self.true
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+
+            # Each clause watching the literal that became false either
+            # finds another literal to watch, becomes unit, or conflicts
+            watchers = self.watches.get(false_literal, [])
+            kept = []
+            self.watches[false_literal] = kept
+            for k, clause in enumerate(watchers):
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if first in true:
+                    kept.append(clause)
+                    continue
+
+                for i in range(2, len(clause)):
+                    if -clause[i] not in true:
+                        clause[1], clause[i] = clause[i], clause[1]
+                        self.watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if -first in true:
+                        kept.extend(watchers[k + 1:])
+                        self.head = len(self.trail)
+                        return clause
+                    self.enqueue(first, clause)
+        return None
+
+    def analyze(self, conflict):
+        """
+        Learn a clause from `conflict` by resolving it with the reasons of
+        literals assigned at the current level, up to the first unique
+        implication point.
+        Return the learned clause, whose first literal becomes unit after
+        backtracking, and the level to backtrack to.
+        """
+        level = len(self.trail_limits)
+        seen = set()
+        learned = [None]
+        count = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        literal = None
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if other == literal or variable in seen or self.levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.levels[variable] == level:
+                    count += 1
+                else:
+                    learned.append(other)
+
+            # Resolve with the reason of the latest literal involved
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            count -= 1
+            if count == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learned[0] = -literal
+
+        # Backtrack to the highest level among the other literals, which
+        # is watched second
+        if len(learned) == 1:
+            return learned, 0
+        highest = max(range(1, len(learned)), key=lambda i: self.levels[abs(learned[i])])
+        learned[1], learned[highest] = learned[highest], learned[1]
+        return learned, self.levels[abs(learned[1])]
+
+    def bump(self, variable):
+        """Increase the activity of a variable involved in a conflict."""
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            for other in self.activity:
+                self.activity[other] *= 1e-100
+            self.increment *= 1e-100
+            self.heap = [
+                (-self.activity[v], v) for v in self.variables
+                if v not in self.levels
+            ]
+            heapq.heapify(self.heap)
+        heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """Undo every assignment made above decision level `level`."""
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phase[variable] = literal > 0
+            self.true.discard(literal)
+            del self.levels[variable]
+            del self.reasons[variable]
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = len(self.trail)
+
+    def pick_branch(self):
+        """Return the unassigned variable with the highest activity, or None."""
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if variable not in self.levels and -activity == self.activity[variable]:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Return True if the clauses are satisfiable with every literal in
+        `assumptions` true, storing a satisfying model in `self.model` as a
+        dict from variable to value; return False otherwise.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        for literal in assumptions:
+            self.register(abs(literal))
+
+        conflicts = 0
+        limit = RESTART_CONFLICTS
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+
+                # A conflict without decisions means no model exists at all
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                conflicts += 1
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) > 1:
+                    self.attach(learned)
+                self.enqueue(learned[0], learned if len(learned) > 1 else None)
+                self.increment /= ACTIVITY_DECAY
+                continue
+
+            # Restart now and then, keeping learned clauses and activities
+            if conflicts >= limit:
+                conflicts = 0
+                limit = int(limit * RESTART_GROWTH)
+                self.backtrack(0)
+                continue
+
+            # Decide the assumptions first, one level each
+            level = len(self.trail_limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.value(literal)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if value is None:
+                    self.enqueue(literal, None)
+                continue
+
+            # Then branch on the most active variable, with its last value
+            variable = self.pick_branch()
+            if variable is None:
+                self.model = {abs(literal): literal > 0 for literal in self.trail}
+                self.backtrack(0)
+                return True
+            self.trail_limits.append(len(self.trail))
+            self.enqueue(variable if self.phase.get(variable, False) else -variable, None)